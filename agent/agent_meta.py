@@ -35,6 +35,8 @@ async def create_agent(
     conversation = SQLiteSession(conversation_id, db_path="../analyst_memory.db")
 
 
+    # Static instructions first, transcript last: the prefix stays byte-identical
+    # across turns so OpenAI prompt caching skips re-prefilling it
     SYSTEM_PROMPT = f'''You have to answer of any question from user if this question relates to the transcript and topics from the transcript
     You have to summarize, provide insights from transcript, use exactly text from transcript as the context.
     
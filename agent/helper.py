@@ -2,18 +2,56 @@ from typing import Any, Dict, Optional, List, Tuple
 import os
 import json
 import ast
+import re
+import threading
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_JSON_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.S)
+
+
+def dumps_json(data, indent: bool = False) -> str:
+    """Non-ASCII-preserving JSON text; orjson when installed, stdlib otherwise"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0).decode("utf-8")
+    if indent:
+        return json.dumps(data, ensure_ascii=False, indent=2)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def loads_json(text):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
 
 def parse_json(answer):
+    if not isinstance(answer, str):
+        return answer
+
+    # Fast path: the model returned bare JSON.
+    # Stdlib on purpose: orjson rejects NaN/Infinity and >64-bit ints that models do emit
     try:
-        answer = json.loads(answer.split("```json")[-1].split("```")[0])
-    except:
-        try:
-            answer = ast.literal_eval(answer.split("```json")[-1].split("```")[0])
-        except:
-            pass
-    return answer
+        return json.loads(answer)
+    except ValueError:
+        pass
+
+    match = _JSON_FENCE.search(answer)
+    body = match.group(1) if match else answer
+    try:
+        return json.loads(body)
+    except ValueError:
+        pass
+    # Prompts show python-style dicts with single quotes, so the model sometimes answers that way
+    try:
+        return ast.literal_eval(body)
+    except (ValueError, SyntaxError, TypeError):
+        return answer
 
 
 # Определяем BASE_DIR один раз
@@ -33,21 +71,47 @@ class AgentSession:
         self.conversation_id = conversation_id
         self.message_id = message_id
         self.answers = []
-        self.transcript = ""
+        self._transcript = ""
+        # Set by every change since the last save/load, so eviction hooks skip untouched sessions
+        self._dirty = False
+        # save() runs in worker threads; one write at a time keeps the newest snapshot last on disk
+        self._save_lock = threading.Lock()
 
-    def save(self):
-        # Используем абсолютный путь
-        if not _CONV_DIR.exists():
-            _CONV_DIR.mkdir(parents=True, exist_ok=True)
+    @property
+    def transcript(self) -> str:
+        return self._transcript
 
-        filepath = _CONV_DIR / self.conversation_id
+    @transcript.setter
+    def transcript(self, value: str):
+        if value != self._transcript:
+            self._transcript = value
+            self._dirty = True
 
-        with open(filepath, "w", encoding="utf-8") as f:
+    def save(self):
+        with self._save_lock:
+            if not self._dirty:
+                return
+            # Cleared before the snapshot: an answer added while the file is written marks it dirty again
+            self._dirty = False
             dump = {
-                "transcript": self.transcript,
-                "answers": self.answers,
+                "transcript": self._transcript,
+                "answers": list(self.answers),
             }
-            json.dump(dump, f, ensure_ascii=False)
+            try:
+                # Используем абсолютный путь
+                if not _CONV_DIR.exists():
+                    _CONV_DIR.mkdir(parents=True, exist_ok=True)
+
+                filepath = _CONV_DIR / self.conversation_id
+                if orjson is not None:
+                    with open(filepath, "wb") as f:
+                        f.write(orjson.dumps(dump))
+                else:
+                    with open(filepath, "w", encoding="utf-8") as f:
+                        json.dump(dump, f, ensure_ascii=False)
+            except BaseException:
+                self._dirty = True
+                raise
 
     def load(self):
         filepath = _CONV_DIR / self.conversation_id
@@ -56,19 +120,25 @@ class AgentSession:
             return
 
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                dump = json.load(f)
-                self.answers = dump.get("answers", [])
-                self.transcript = dump.get("transcript", "")
+            if orjson is not None:
+                dump = orjson.loads(filepath.read_bytes())
+            else:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    dump = json.load(f)
+            self.answers = dump.get("answers", [])
+            self._transcript = dump.get("transcript", "")
         except Exception as e:
             print(f"Error loading session {self.conversation_id}: {e}")
             self.answers = []
-            self.transcript = ""
+            self._transcript = ""
+        self._dirty = False
 
     def start_new_turn(self):
         """Call this at the start of each user message"""
         self.answers = []
         self.transcript = ""
+        self._dirty = True
 
     def add_answer(self, answer):
-        self.answers.append(answer)
\ No newline at end of file
+        self.answers.append(answer)
+        self._dirty = True
\ No newline at end of file
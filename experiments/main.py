@@ -1,18 +1,19 @@
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 from pydub import AudioSegment
-import io
-import math
-from tqdm import tqdm
-from process_audio import get_transcript
+from tqdm.asyncio import tqdm_asyncio
+from process_audio import get_transcript, transcribe_segment, split_pcm
 import asyncio
 import time
 import json, ast
 import nltk
-from nltk.tokenize import sent_tokenize
+from nltk.tokenize import PunktTokenizer
 # nltk.download('punkt_tab')
 # nltk.download('punkt')
 
+# Same model sent_tokenize uses, loaded once instead of resolved on every call
+sentence_tokenizer = PunktTokenizer("english")
+
 def parse_json(answer):
     try:
         answer = json.loads(answer.split("```json")[-1].split("```")[0])
@@ -25,75 +26,93 @@ def parse_json(answer):
 
 load_dotenv()
 
-start_time = time.perf_counter()
-transcript = asyncio.run(get_transcript())
-end_time = time.perf_counter()
-elapsed_time = end_time - start_time
-print(f"Execution time: {elapsed_time:.4f} seconds")
+async_client = AsyncOpenAI()
+
+
+async def ask_gpt(prompt):
+    res = await async_client.chat.completions.create(messages=[{"role": "user", "content": prompt}],
+                                                     model="gpt-5.2", reasoning_effort="medium")
+    return parse_json(res.choices[0].message.content)
 
-with open("transcript.txt", "r") as f:
-    tr_text = f.read()
 
-client = OpenAI()
+def transcript_prefix(transcript):
+    # Identical leading text across prompts lets OpenAI prompt caching reuse the transcript prefill
+    return f"Transcript:\n{transcript}\n\n==========\n"
 
-prompt = f"Define the number of speakers for Transcript:\n{transcript}\n\n==========\nReturn json {{'speakers': ['name': <>, 'role': <>, 'contribution': <>]}}"
-res = client.chat.completions.create(messages=[{"role": "user", "content": prompt}],
-                                     model="gpt-5.2", reasoning_effort="medium")
 
-speakers = parse_json(res.choices[0].message.content)
+async def define_speakers(transcript):
+    prompt = transcript_prefix(transcript) + "Define the number of speakers for the transcript above.\nReturn json {'speakers': ['name': <>, 'role': <>, 'contribution': <>]}"
+    return await ask_gpt(prompt)
 
-sentences = sent_tokenize(transcript)
 
-numbered_text = ""
-for i, sent in enumerate(sentences):
-    numbered_text += f"[{i}] {sent}\n"
+async def diarize(transcript, speakers):
+    sentences = sentence_tokenizer.tokenize(transcript)
 
-prompt = f'''You are a diarization assistant.
+    numbered_text = "\n".join(f"[{i}] {sent}" for i, sent in enumerate(sentences))
+
+    prompt = f'''You are a diarization assistant.
 I will provide a text split into numbered sentences (IDs).
 Your task is to group these sentences by speaker based on the context and flow of conversation.
-Speakers: {speakers['speakers']}
 Rules:
 1. DO NOT rewrite the text. Return ONLY a JSON list.
 2. Group consecutive sentences by the same speaker into blocks.
 3. The format must be: {{"speaker": "Name", "start_id": <int>, "end_id": <int>}}
 4. Cover ALL IDs from 0 to {len(sentences)-1}.
-Input Text:
-{numbered_text}
 Response example (JSON only):
 [
   {{"speaker": "Иван", "start_id": 0, "end_id": 3}},
   {{"speaker": "Мария", "start_id": 4, "end_id": 4}},
   {{"speaker": "Иван", "start_id": 5, "end_id": 10}}
-]'''
-res = client.chat.completions.create(messages=[{"role": "user", "content": prompt}],
-                                     model="gpt-5.2", reasoning_effort="medium")
-new_transcript = parse_json(res.choices[0].message.content)
-
-prompt = f"Define the key-point for each speaker form transcript. Speakers are {speakers['speakers']}. Transcript :\n{transcript}\n\n==========\nReturn json {{'key_points': ['phrase': <first 5 words of speaker's phrase>, 'speaker': <speaker name>]}}"
-res = client.chat.completions.create(messages=[{"role": "user", "content": prompt}],
-                                     model="gpt-5.2", reasoning_effort="medium")
-key_points = parse_json(res.choices[0].message.content)
-
-
-
-audio_file = AudioSegment.from_file("../agent/audio.mp3")
-split_len = 300 * 1000
-total_chunks = math.ceil(len(audio_file) / split_len)
-for i in tqdm(range(2,total_chunks)):
-    start_time = i * split_len
-    end_time = (i + 1) * split_len
-
-    chunk = audio_file[start_time:end_time]
-    buffer = io.BytesIO()
-    chunk.export(buffer, format="mp3")
-    buffer.seek(0)
-    buffer.name = "chunk.mp3"
-
-    transcription = client.audio.transcriptions.create(
-        model="whisper-1",
-        file=buffer
+]
+Input Text:
+{numbered_text}
+Speakers: {speakers['speakers']}'''
+    return await ask_gpt(prompt)
+
+
+async def define_key_points(transcript, speakers):
+    prompt = transcript_prefix(transcript) + f"Define the key-point for each speaker form the transcript above. Speakers are {speakers['speakers']}.\nReturn json {{'key_points': ['phrase': <first 5 words of speaker's phrase>, 'speaker': <speaker name>]}}"
+    return await ask_gpt(prompt)
+
+
+async def analyze(transcript):
+    # Diarization and key points both depend only on speakers - run them concurrently
+    speakers = await define_speakers(transcript)
+    new_transcript, key_points = await asyncio.gather(
+        diarize(transcript, speakers),
+        define_key_points(transcript, speakers)
     )
+    return speakers, new_transcript, key_points
+
+
+async def transcribe_tail(fname, skip_chunks=2):
+    audio_file = AudioSegment.from_file(fname)
+    chunks = split_pcm(audio_file, 300 * 1000)[skip_chunks:]
+
+    sem = asyncio.Semaphore(5)
+    tasks = [transcribe_segment(chunk, i, sem) for i, chunk in enumerate(chunks, start=skip_chunks)]
+    results = await tqdm_asyncio.gather(*tasks)
+    return "\n".join(results)
+
+
+async def main():
+    # One event loop for every step: the module-level AsyncOpenAI clients keep their httpx
+    # pools bound to the loop that opened them, so a second asyncio.run would break them
+    start_time = time.perf_counter()
+    transcript = await get_transcript()
+    end_time = time.perf_counter()
+    elapsed_time = end_time - start_time
+    print(f"Execution time: {elapsed_time:.4f} seconds")
+
+    with open("transcript.txt", "r") as f:
+        tr_text = f.read()
+
+    speakers, new_transcript, key_points = await analyze(transcript)
+
+    tail_text = await transcribe_tail("../agent/audio.mp3")
+    tr_text = f"{tr_text}\n{tail_text}"
+
+    print(tr_text)
 
-    tr_text = f"{tr_text}\n{transcription.text}"
 
-print(tr_text)
\ No newline at end of file
+asyncio.run(main())
\ No newline at end of file
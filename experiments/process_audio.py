@@ -1,20 +1,52 @@
 import asyncio
 import io
-import math
+import os
+import wave
+from concurrent.futures import ThreadPoolExecutor
 from pydub import AudioSegment
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
 load_dotenv()
 
 client = AsyncOpenAI()
+# Whisper resamples to 16 kHz mono internally, so sending that as WAV loses nothing
+WHISPER_FRAME_RATE = 16000
+WHISPER_SAMPLE_WIDTH = 2
+encoder_pool = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+
+def normalize_pcm(audio):
+    """Resample to the 16 kHz mono 16-bit layout Whisper expects and return the raw samples"""
+    audio = audio.set_frame_rate(WHISPER_FRAME_RATE).set_channels(1).set_sample_width(WHISPER_SAMPLE_WIDTH)
+    return memoryview(audio.raw_data)
+
+
+def split_pcm(audio, split_len):
+    """Normalize audio once and return zero-copy views over its PCM, split_len ms each"""
+    pcm = normalize_pcm(audio)
+    step = split_len * WHISPER_FRAME_RATE // 1000 * WHISPER_SAMPLE_WIDTH
+    return [pcm[offset:offset + step] for offset in range(0, len(pcm), step)]
+
+
+def encode_chunk(pcm, index):
+    buffer = io.BytesIO()
+    # WAV is just a header over the PCM samples - no mp3 encoder pass
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(WHISPER_SAMPLE_WIDTH)
+        wav.setframerate(WHISPER_FRAME_RATE)
+        wav.writeframes(pcm)
+    buffer.seek(0)
+    buffer.name = f"part_{index}.wav"
+    return buffer
+
 
 async def transcribe_segment(chunk, index, semaphore):
     async with semaphore:
         try:
-            buffer = io.BytesIO()
-            chunk.export(buffer, format="mp3")
-            buffer.seek(0)
-            buffer.name = f"part_{index}.mp3"
+            # Building the WAV copies the PCM slice - keep it off the event loop so other uploads overlap
+            loop = asyncio.get_running_loop()
+            buffer = await loop.run_in_executor(encoder_pool, encode_chunk, chunk, index)
 
             print(f"--> Sending Chunk {index}...")
 
@@ -32,32 +64,48 @@ async def transcribe_segment(chunk, index, semaphore):
             return ""
 
 
-async def get_transcript(fname = "audio.mp3"):
-    print("Loading audio...")
-    audio = AudioSegment.from_file(fname)
+def transcribe_local(pcm, model_size="large-v3", batch_size=16):
+    """Batched on-device transcription of the whole file with faster-whisper (no per-chunk uploads)"""
+    import numpy as np
+    from faster_whisper import WhisperModel, BatchedInferencePipeline
+
+    model = WhisperModel(model_size, compute_type="int8_float16")
+    batched = BatchedInferencePipeline(model=model)
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    segments, _ = batched.transcribe(samples, batch_size=batch_size)
+    return " ".join(segment.text.strip() for segment in segments)
+
+
+async def iter_transcript(chunks, concurrency=5):
+    """Transcribe chunks concurrently, yielding texts in order as soon as each one is ready"""
+    sem = asyncio.Semaphore(concurrency)
 
-    split_len = 15 * 60 * 1000  # 10 minutes
-    total_duration = len(audio)
-    total_chunks = math.ceil(total_duration / split_len)
+    print(f"Starting async transcription for {len(chunks)} parts...")
 
-    chunks = []
-    for i in range(total_chunks):
-        start = i * split_len
-        end = min((i + 1) * split_len, total_duration)
-        chunks.append(audio[start:end])
+    # No TaskGroup here: a consumer that stops early would deliver GeneratorExit inside its scope
+    tasks = [asyncio.create_task(transcribe_segment(chunk, i, sem)) for i, chunk in enumerate(chunks)]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        # Early exit, cancellation or a failed part: drop whatever is still running
+        for task in tasks:
+            task.cancel()
 
-    sem = asyncio.Semaphore(5)
 
-    tasks = []
-    for i, chunk in enumerate(chunks):
-        task = transcribe_segment(chunk, i, sem)
-        tasks.append(task)
+async def get_transcript(fname = "audio.mp3", backend="openai"):
+    print("Loading audio...")
+    audio = AudioSegment.from_file(fname)
 
-    print(f"Starting async transcription for {len(tasks)} parts...")
+    if backend == "faster-whisper":
+        print("Starting local batched transcription...")
+        return await asyncio.to_thread(transcribe_local, normalize_pcm(audio))
 
-    results = await asyncio.gather(*tasks)
+    split_len = 10 * 60 * 1000  # 10 minutes (~19 MB of 16 kHz WAV, under the 25 MB upload limit)
+    chunks = split_pcm(audio, split_len)
+
+    results = [text async for text in iter_transcript(chunks)]
 
     full_text = " ".join(results)
 
     return full_text
-
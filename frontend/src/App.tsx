@@ -50,9 +50,13 @@ function App() {
   const messagesEndRef = useRef<HTMLDivElement | null>(null);
   const fileInputRef = useRef<HTMLInputElement | null>(null);
   const editInputRef = useRef<HTMLInputElement | null>(null);
+  // Read by pollSuggestions after each await, to drop results for a conversation the user has left
+  const currentFileHashRef = useRef<string | null>(null);
 
   useEffect(() => { loadConversations(); }, []);
 
+  useEffect(() => { currentFileHashRef.current = currentFileHash; }, [currentFileHash]);
+
   useEffect(() => {
     if (currentConvId) {
       loadMessages(currentConvId);
@@ -63,6 +67,8 @@ function App() {
         setCurrentFileHash(conv.file_hash);
         loadSuggestions(conv.file_hash);
       } else {
+        // Not found just means the list hasn't reloaded yet after an upload; keep that upload's hash
+        if (conv) setCurrentFileHash(null);
         setSuggestions([]);
       }
 
@@ -112,6 +118,25 @@ function App() {
     }
   };
 
+  // Suggestions for a cached upload may still be generating server-side
+  const pollSuggestions = async (fileHash: string, attempts = 15) => {
+    for (let i = 0; i < attempts; i++) {
+      try {
+        const data = await api.getSuggestions(fileHash);
+        if (currentFileHashRef.current !== fileHash) return;
+        if (data && data.length) {
+          setSuggestions(data);
+          return;
+        }
+      } catch (e) {
+        console.error("Failed to load suggestions:", e);
+      }
+      await new Promise(resolve => setTimeout(resolve, 2000));
+      // Switched conversation or reset while waiting: stop polling for the old upload
+      if (currentFileHashRef.current !== fileHash) return;
+    }
+  };
+
   const resetAllState = () => {
     setCurrentConvId(null);
     setCurrentFileHash(null);
@@ -235,7 +260,11 @@ function App() {
           setUploadProgress(100);
           setCurrentConvId(convId);
           await loadConversations();
-          await loadSuggestions(fileHash);
+          if (res.suggestions_pending) {
+            pollSuggestions(fileHash);
+          } else {
+            await loadSuggestions(fileHash);
+          }
           setUploading(false);
           return;
       }
@@ -323,13 +352,21 @@ function App() {
       eventSource.onmessage = (event) => {
         const data = JSON.parse(event.data);
         if (data.type === 'delta') {
-          agentMsg.text = data.accumulated;
+          agentMsg.text += data.delta;
           setMessages(prev => {
             const newMsgs = [...prev];
             newMsgs[newMsgs.length - 1] = { ...agentMsg };
             return newMsgs;
           });
         } else if (data.type === 'done' || data.type === 'end') {
+          if (data.type === 'done' && data.text) {
+            agentMsg.text = data.text;
+            setMessages(prev => {
+              const newMsgs = [...prev];
+              newMsgs[newMsgs.length - 1] = { ...agentMsg };
+              return newMsgs;
+            });
+          }
           eventSource.close();
           setLoading(false);
         } else if (data.type === 'error') {
@@ -4,13 +4,31 @@ With file_hash support for caching suggestions
 """
 
 import sqlite3
-import json
-from datetime import datetime
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 from dataclasses import dataclass, asdict
 from enum import Enum
 import threading
+import contextlib
+import time
+from collections import Counter, OrderedDict
+
+from agent.helper import dumps_json, loads_json
+
+
+_second_prefix = (None, "")
+
+
+def _now_iso() -> str:
+    """Local-time ISO timestamp like datetime.now().isoformat(), re-formatting the date part once per second"""
+    global _second_prefix
+    second, micro = divmod(time.time_ns() // 1000, 1_000_000)
+    cached_second, prefix = _second_prefix
+    if second != cached_second:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(second))
+        _second_prefix = (second, prefix)
+    # Always keep the fraction (isoformat drops it at .000000) so stored values sort as strings
+    return f"{prefix}.{micro:06d}"
 
 
 class ArtifactType(str, Enum):
@@ -55,32 +73,325 @@ class Artifact:
     created_at: Optional[str] = None
 
 
+# Children cascade on delete, so removing a conversation is a single statement
+_MESSAGES_DDL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        uuid TEXT PRIMARY KEY,
+        conversation_uuid TEXT NOT NULL,
+        user_uuid TEXT NOT NULL,
+        task_id TEXT,
+        prompt TEXT,
+        answer TEXT,
+        summary TEXT,
+        created_at TEXT NOT NULL,
+        artifacts_json TEXT,
+        FOREIGN KEY (conversation_uuid) REFERENCES conversations(uuid) ON DELETE CASCADE
+    )
+'''
+
+_ARTIFACTS_DDL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        message_uuid TEXT NOT NULL,
+        artifact_type TEXT NOT NULL,
+        name TEXT,
+        path TEXT,
+        data TEXT,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY (message_uuid) REFERENCES messages(uuid) ON DELETE CASCADE
+    )
+'''
+
+# Hot-path statements live here so every call hits the connection's prepared-statement cache
+# Same order as the Conversation fields, so rows unpack positionally with Conversation(*row)
+_CONVERSATION_COLUMNS = 'uuid, user_uuid, title, file_hash, created_at, updated_at, message_count'
+
+SQL_UPSERT_CONVERSATION = f'''
+    INSERT INTO conversations (uuid, user_uuid, title, file_hash, created_at, updated_at, message_count)
+    VALUES (?1, ?2, COALESCE(?3, ?7), ?4, ?5, ?6, 0)
+    ON CONFLICT(uuid) DO UPDATE SET
+        updated_at = excluded.updated_at,
+        -- ?3 is an explicit title and always wins; ?7 (auto title) only fills an empty one
+        title = COALESCE(?3, title, ?7),
+        file_hash = COALESCE(excluded.file_hash, file_hash)
+    RETURNING {_CONVERSATION_COLUMNS}
+'''
+
+SQL_GET_CONVERSATION = f'SELECT {_CONVERSATION_COLUMNS} FROM conversations WHERE uuid = ?'
+
+SQL_LIST_CONVERSATIONS = f'''
+    SELECT {_CONVERSATION_COLUMNS} FROM conversations 
+    WHERE user_uuid = ? 
+    ORDER BY updated_at DESC 
+    LIMIT ?
+'''
+
+SQL_INSERT_MESSAGE = '''
+    INSERT INTO messages 
+    (uuid, conversation_uuid, user_uuid, task_id, prompt, answer, summary, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+SQL_BUMP_MESSAGE_COUNT = '''
+    UPDATE conversations 
+    SET message_count = message_count + ?, updated_at = ?
+    WHERE uuid = ?
+'''
+
+# artifacts_json mirrors the artifacts rows of a message, so reads never need the join
+_MESSAGE_COLUMNS = '''
+    uuid, conversation_uuid, user_uuid, task_id, prompt, answer, summary, created_at, artifacts_json
+'''
+
+SQL_GET_MESSAGE = f'SELECT {_MESSAGE_COLUMNS} FROM messages WHERE uuid = ?'
+
+# Skips the potentially large prompt/answer bodies; fetch them with SQL_GET_MESSAGE_BODIES
+SQL_GET_MESSAGE_LITE = '''
+    SELECT uuid, conversation_uuid, user_uuid, task_id, NULL AS prompt, NULL AS answer, summary, created_at, artifacts_json
+    FROM messages WHERE uuid = ?
+'''
+
+SQL_GET_MESSAGE_BODIES = 'SELECT prompt, answer FROM messages WHERE uuid = ?'
+
+# Bulk-inserted messages share created_at, so rowid keeps them in insertion order
+SQL_LIST_MESSAGES = f'''
+    SELECT {_MESSAGE_COLUMNS} FROM messages 
+    WHERE conversation_uuid = ? 
+    ORDER BY created_at ASC, rowid ASC 
+    LIMIT ?
+'''
+
+# Multi-row VALUES + RETURNING (SQLite 3.35+); 6 params per row keeps batches under the 999 variable limit
+_ARTIFACT_ROW_PARAMS = '(?, ?, ?, ?, ?, ?)'
+ARTIFACT_INSERT_BATCH = 150
+
+SQL_INSERT_ARTIFACTS_RETURNING = '''
+    INSERT INTO artifacts (message_uuid, artifact_type, name, path, data, created_at)
+    VALUES {values}
+    RETURNING id
+'''
+
+SQL_APPEND_ARTIFACT_JSON = '''
+    UPDATE messages 
+    SET artifacts_json = json_insert(COALESCE(artifacts_json, '[]'), '$[#]', json(?))
+    WHERE uuid = ?
+'''
+
+# Column order matches the Artifact fields for Artifact(*row)
+SQL_LIST_ARTIFACTS = '''
+    SELECT id, message_uuid, artifact_type, name, path, data, created_at
+    FROM artifacts WHERE message_uuid = ?
+'''
+
+
+class _LRUCache:
+    """Thread-safe OrderedDict LRU; put() with a stale generation is dropped so a slow read can't resurrect a row"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.generation = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value, generation: Optional[int] = None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, *keys):
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+
+class _ReaderPool:
+    """Bounded set of read-only connections shared by all threads; close_all() retires checked-out ones too"""
+
+    def __init__(self, connect, max_readers: int = 8):
+        self._connect = connect
+        self.max_readers = max_readers
+        self._idle: List[sqlite3.Connection] = []
+        self._created = 0
+        self._generation = 0
+        self._cond = threading.Condition()
+
+    @contextlib.contextmanager
+    def connection(self):
+        with self._cond:
+            while not self._idle and self._created >= self.max_readers:
+                self._cond.wait()
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                self._created += 1
+            generation = self._generation
+        if conn is None:
+            try:
+                conn = self._connect()
+            except BaseException:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+        try:
+            yield conn
+        finally:
+            with self._cond:
+                if generation == self._generation:
+                    # LIFO reuse keeps the warmest page cache in play
+                    self._idle.append(conn)
+                else:
+                    conn.close()
+                    self._created -= 1
+                self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            self._generation += 1
+            for conn in self._idle:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._created -= len(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+
+
 class ConversationRepository:
 
-    def __init__(self, db_path: str = "./conversations_metadata.db"):
+    def __init__(self, db_path: str = "./conversations_metadata.db", max_readers: int = 8):
         self.db_path = db_path
-        self._local = threading.local()
+        # One shared read-write connection serialized by a lock, plus a small pool of read-only ones
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.RLock()
+        # Nesting depth of transaction() on the writer; only the outermost level BEGINs and COMMITs
+        self._tx_depth = 0
+        # (cache, keys) touched inside the open transaction; invalidated only once it commits, so a reader
+        # that sees the old committed row in between can't cache it under the new generation
+        self._pending_invalidations: List[tuple] = []
+        self._readers = _ReaderPool(lambda: self._connect(readonly=True), max_readers)
+        # Hot-key caches for get_conversation/get_message; every write path invalidates what it touches
+        self._conv_cache = _LRUCache(1024)
+        self._msg_cache = _LRUCache(1024)
         self._init_db()
 
-    def _get_connection(self):
-        if not hasattr(self._local, 'connection') or self._local.connection is None:
-            conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            conn.row_factory = sqlite3.Row
-            conn.execute("PRAGMA journal_mode=DELETE")
-            conn.execute("PRAGMA synchronous=FULL")
-            self._local.connection = conn
-        return self._local.connection
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        # Autocommit mode: single statements commit on their own, batches use explicit BEGIN
+        if readonly:
+            conn = sqlite3.connect(
+                f"{Path(self.db_path).resolve().as_uri()}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+                cached_statements=256,
+                isolation_level=None
+            )
+        else:
+            conn = sqlite3.connect(
+                self.db_path,
+                check_same_thread=False,
+                cached_statements=256,
+                isolation_level=None
+            )
+            # Only takes effect on a fresh database; lets deletes hand pages back via incremental_vacuum
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            # WAL lets readers run alongside the writer; NORMAL only fsyncs at checkpoints
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA cache_size=-65536")
+        # Wait for a competing writer instead of failing with SQLITE_BUSY
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """The writer; hold _write_lock while using it"""
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            return self._writer
+
+    def _reader(self):
+        """Pooled read-only connection: `with self._reader() as conn:`"""
+        return self._readers.connection()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Group writes into one BEGIN IMMEDIATE ... COMMIT; nested uses join the outer transaction"""
+        with self._write_lock:
+            conn = self._get_connection()
+            if self._tx_depth == 0:
+                conn.execute("BEGIN IMMEDIATE")
+            self._tx_depth += 1
+            try:
+                yield conn
+            except BaseException:
+                self._tx_depth -= 1
+                if self._tx_depth == 0:
+                    conn.rollback()
+                    self._pending_invalidations.clear()
+                    # Writes inside may already have refreshed cache entries
+                    self._conv_cache.clear()
+                    self._msg_cache.clear()
+                raise
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                conn.commit()
+                pending, self._pending_invalidations = self._pending_invalidations, []
+                for cache, keys in pending:
+                    self._apply_invalidation(cache, keys)
+
+    def _invalidate(self, cache: "_LRUCache", *keys, everything: bool = False) -> bool:
+        """Drop keys (or the whole cache) now, or at COMMIT when inside transaction(); True if done now.
+        Call under _write_lock."""
+        keys = None if everything else keys
+        if self._tx_depth:
+            self._pending_invalidations.append((cache, keys))
+            return False
+        self._apply_invalidation(cache, keys)
+        return True
+
+    @staticmethod
+    def _apply_invalidation(cache: "_LRUCache", keys: Optional[tuple]):
+        if keys is None:
+            cache.clear()
+        else:
+            cache.invalidate(*keys)
 
     def _close_connection(self):
-        if hasattr(self._local, 'connection') and self._local.connection is not None:
-            try:
-                self._local.connection.close()
-            except:
-                pass
-            self._local.connection = None
+        with self._write_lock:
+            if self._writer is not None:
+                try:
+                    self._writer.close()
+                except:
+                    pass
+            self._writer = None
+            self._readers.close_all()
 
     def _init_db(self):
-        conn = self._get_connection()
+        with self._write_lock:
+            self._create_schema(self._get_connection())
+
+    def _create_schema(self, conn):
         cursor = conn.cursor()
 
         cursor.execute('''
@@ -95,151 +406,196 @@ class ConversationRepository:
             )
         ''')
 
-        # Миграция: добавляем file_hash если нет
-        cursor.execute("PRAGMA table_info(conversations)")
-        columns = [col[1] for col in cursor.fetchall()]
-        if 'file_hash' not in columns:
-            cursor.execute('ALTER TABLE conversations ADD COLUMN file_hash TEXT')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS messages (
-                uuid TEXT PRIMARY KEY,
-                conversation_uuid TEXT NOT NULL,
-                user_uuid TEXT NOT NULL,
-                task_id TEXT,
-                prompt TEXT,
-                answer TEXT,
-                summary TEXT,
-                created_at TEXT NOT NULL,
-                FOREIGN KEY (conversation_uuid) REFERENCES conversations(uuid)
-            )
-        ''')
+        cursor.execute(_MESSAGES_DDL.format(table='messages'))
+        cursor.execute(_ARTIFACTS_DDL.format(table='artifacts'))
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS artifacts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                message_uuid TEXT NOT NULL,
-                artifact_type TEXT NOT NULL,
-                name TEXT,
-                path TEXT,
-                data TEXT,
-                created_at TEXT NOT NULL,
-                FOREIGN KEY (message_uuid) REFERENCES messages(uuid)
-            )
-        ''')
+        # Schema checks only run when the stored version is behind, not on every start
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for target in sorted(self.MIGRATIONS):
+            if target > version:
+                self.MIGRATIONS[target](self, conn)
+                conn.execute(f"PRAGMA user_version={target}")
 
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_conv_user ON conversations(user_uuid)')
+        # Composite indexes match the WHERE + ORDER BY of list_conversations / list_messages
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_conv_user_updated ON conversations(user_uuid, updated_at DESC)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_conv_hash ON conversations(file_hash)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_msg_conv ON messages(conversation_uuid)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_msg_conv_created ON messages(conversation_uuid, created_at)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_msg_task ON messages(task_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_art_msg ON artifacts(message_uuid)')
 
-        conn.commit()
+    def _migrate_file_hash(self, conn):
+        # Миграция: добавляем file_hash если нет
+        columns = [col[1] for col in conn.execute("PRAGMA table_info(conversations)")]
+        if 'file_hash' not in columns:
+            conn.execute('ALTER TABLE conversations ADD COLUMN file_hash TEXT')
+
+    def _migrate_composite_indexes(self, conn):
+        # Superseded by idx_conv_user_updated / idx_msg_conv_created, which share their leading column
+        conn.execute('DROP INDEX IF EXISTS idx_conv_user')
+        conn.execute('DROP INDEX IF EXISTS idx_msg_conv')
+
+    def _migrate_cascade(self, conn):
+        """Rebuild tables created before ON DELETE CASCADE was declared (SQLite can't ALTER a FK)"""
+        stale = []
+        for table, ddl in (('messages', _MESSAGES_DDL), ('artifacts', _ARTIFACTS_DDL)):
+            fks = conn.execute(f"PRAGMA foreign_key_list({table})").fetchall()
+            if any(fk['on_delete'] != 'CASCADE' for fk in fks):
+                stale.append((table, ddl))
+        if not stale:
+            return
+
+        # foreign_keys can't be toggled inside a transaction, and must be off so DROP doesn't cascade
+        conn.execute("PRAGMA foreign_keys=OFF")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for table, ddl in stale:
+                columns = ", ".join(col['name'] for col in conn.execute(f"PRAGMA table_info({table})"))
+                conn.execute(ddl.format(table=f"{table}_new"))
+                conn.execute(f"INSERT INTO {table}_new ({columns}) SELECT {columns} FROM {table}")
+                conn.execute(f"DROP TABLE {table}")
+                conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("PRAGMA foreign_keys=ON")
+
+    def _migrate_artifacts_json(self, conn):
+        columns = [col[1] for col in conn.execute("PRAGMA table_info(messages)")]
+        if 'artifacts_json' not in columns:
+            conn.execute('ALTER TABLE messages ADD COLUMN artifacts_json TEXT')
+        # Backfill from the artifacts table, which stays the source of truth
+        conn.execute('''
+            UPDATE messages SET artifacts_json = (
+                SELECT json_group_array(json_object(
+                    'id', a.id, 'message_uuid', a.message_uuid, 'artifact_type', a.artifact_type,
+                    'name', a.name, 'path', a.path, 'data', a.data, 'created_at', a.created_at
+                ))
+                FROM (SELECT * FROM artifacts WHERE message_uuid = messages.uuid ORDER BY id) a
+            )
+            WHERE uuid IN (SELECT message_uuid FROM artifacts)
+        ''')
+
+    # user_version -> migration; each one must also be a no-op on a freshly created schema
+    MIGRATIONS = {
+        1: _migrate_file_hash,
+        2: _migrate_composite_indexes,
+        3: _migrate_cascade,
+        4: _migrate_artifacts_json,
+    }
 
     def create_or_update_conversation(
         self,
         conversation_uuid: str,
         user_uuid: str,
         title: Optional[str] = None,
-        file_hash: Optional[str] = None
+        file_hash: Optional[str] = None,
+        auto_title: Optional[str] = None
     ) -> Conversation:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        now = datetime.now().isoformat()
-
-        cursor.execute('SELECT * FROM conversations WHERE uuid = ?', (conversation_uuid,))
-        existing = cursor.fetchone()
-
-        if existing:
-            cursor.execute('''
-                UPDATE conversations 
-                SET updated_at = ?, 
-                    title = COALESCE(?, title), 
-                    file_hash = COALESCE(?, file_hash)
-                WHERE uuid = ?
-            ''', (now, title, file_hash, conversation_uuid))
-        else:
-            cursor.execute('''
-                INSERT INTO conversations (uuid, user_uuid, title, file_hash, created_at, updated_at, message_count)
-                VALUES (?, ?, ?, ?, ?, ?, 0)
-            ''', (conversation_uuid, user_uuid, title, file_hash, now, now))
-
-        conn.commit()
-        return self.get_conversation(conversation_uuid)
+        with self._write_lock:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            now = _now_iso()
+
+            # Drain the RETURNING rows so the autocommit statement finishes and releases the write lock
+            cursor.execute(SQL_UPSERT_CONVERSATION,
+                           (conversation_uuid, user_uuid, title, file_hash, now, now, auto_title))
+            row = cursor.fetchall()[0]
+
+            conversation = Conversation(*row)
+            # Inside a transaction the row isn't committed yet, so it can't be cached until then
+            if self._invalidate(self._conv_cache, conversation_uuid):
+                self._conv_cache.put(conversation_uuid, conversation)
+            return conversation
 
     def get_conversation(self, conversation_uuid: str) -> Optional[Conversation]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM conversations WHERE uuid = ?', (conversation_uuid,))
-        row = cursor.fetchone()
-
-        if row:
-            return Conversation(
-                uuid=row['uuid'],
-                user_uuid=row['user_uuid'],
-                title=row['title'],
-                file_hash=row['file_hash'] if 'file_hash' in row.keys() else None,
-                created_at=row['created_at'],
-                updated_at=row['updated_at'],
-                message_count=row['message_count']
-            )
-        return None
+        conversation = self._conv_cache.get(conversation_uuid)
+        if conversation is not None:
+            return conversation
+
+        generation = self._conv_cache.generation
+        conversation = self._get_conversation_uncached(conversation_uuid)
+        if conversation is not None:
+            self._conv_cache.put(conversation_uuid, conversation, generation)
+        return conversation
+
+    def _get_conversation_uncached(self, conversation_uuid: str) -> Optional[Conversation]:
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SQL_GET_CONVERSATION, (conversation_uuid,))
+            row = cursor.fetchone()
+
+            if row:
+                return Conversation(*row)
+            return None
 
     def list_conversations(self, user_uuid: str, limit: int = 100) -> List[Conversation]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM conversations 
-            WHERE user_uuid = ? 
-            ORDER BY updated_at DESC 
-            LIMIT ?
-        ''', (user_uuid, limit))
-
-        conversations = []
-        for row in cursor.fetchall():
-            conversations.append(Conversation(
-                uuid=row['uuid'],
-                user_uuid=row['user_uuid'],
-                title=row['title'],
-                file_hash=row['file_hash'] if 'file_hash' in row.keys() else None,
-                created_at=row['created_at'],
-                updated_at=row['updated_at'],
-                message_count=row['message_count']
-            ))
-        return conversations
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SQL_LIST_CONVERSATIONS, (user_uuid, limit))
+
+            return [Conversation(*row) for row in cursor.fetchall()]
+
+    def rename_conversation(self, conversation_uuid: str, title: str):
+        with self._write_lock:
+            conn = self._get_connection()
+            conn.execute(
+                'UPDATE conversations SET title = ?, updated_at = ? WHERE uuid = ?',
+                (title, _now_iso(), conversation_uuid)
+            )
+            self._invalidate(self._conv_cache, conversation_uuid)
 
     def delete_conversation(self, conversation_uuid: str):
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._write_lock:
+            conn = self._get_connection()
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            DELETE FROM artifacts 
-            WHERE message_uuid IN (SELECT uuid FROM messages WHERE conversation_uuid = ?)
-        ''', (conversation_uuid,))
-        cursor.execute('DELETE FROM messages WHERE conversation_uuid = ?', (conversation_uuid,))
-        cursor.execute('DELETE FROM conversations WHERE uuid = ?', (conversation_uuid,))
-        conn.commit()
+            # messages and their artifacts go with it via ON DELETE CASCADE
+            cursor.execute('DELETE FROM conversations WHERE uuid = ?', (conversation_uuid,))
+            self._invalidate(self._conv_cache, conversation_uuid)
+            # Cached messages aren't indexed by conversation; deletes are rare enough to just drop them all
+            self._invalidate(self._msg_cache, everything=True)
 
     def hard_reset(self):
-        self._close_connection()
+        with self._write_lock:
+            self._close_connection()
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        try:
-            cursor.execute("PRAGMA foreign_keys = OFF")
-            cursor.execute("DROP TABLE IF EXISTS artifacts")
-            cursor.execute("DROP TABLE IF EXISTS messages")
-            cursor.execute("DROP TABLE IF EXISTS conversations")
-            conn.commit()
-            cursor.execute("VACUUM")
-            conn.commit()
-        finally:
-            conn.close()
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
 
-        self._init_db()
+            try:
+                # Fold the WAL back into the main file and truncate it before dropping everything
+                cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+                cursor.execute("PRAGMA foreign_keys = OFF")
+                cursor.execute("DROP TABLE IF EXISTS artifacts")
+                cursor.execute("DROP TABLE IF EXISTS messages")
+                cursor.execute("DROP TABLE IF EXISTS conversations")
+                conn.commit()
+                # Cheap page release instead of a full VACUUM rewrite (no-op unless auto_vacuum is INCREMENTAL)
+                cursor.execute("PRAGMA incremental_vacuum").fetchall()
+                conn.commit()
+            finally:
+                conn.close()
+
+            self._init_db()
+            self._conv_cache.clear()
+            self._msg_cache.clear()
         print(f"Database hard reset completed: {self.db_path}")
 
+    def maintenance_vacuum(self):
+        """Full VACUUM - rewrites the whole file under an exclusive lock, so keep it off request paths"""
+        with self._write_lock:
+            conn = self._get_connection()
+            conn.execute("VACUUM")
+
+    def maintenance_checkpoint(self) -> Dict[str, int]:
+        """Checkpoint and truncate the WAL; safe to call periodically from a scheduler"""
+        with self._write_lock:
+            conn = self._get_connection()
+            busy, log_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        return {'busy': busy, 'log_pages': log_pages, 'checkpointed': checkpointed}
+
     def create_message(
         self,
         message_uuid: str,
@@ -250,24 +606,46 @@ class ConversationRepository:
         answer: Optional[str] = None,
         summary: Optional[str] = None
     ) -> Message:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        now = datetime.now().isoformat()
-
-        cursor.execute('''
-            INSERT INTO messages 
-            (uuid, conversation_uuid, user_uuid, task_id, prompt, answer, summary, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (message_uuid, conversation_uuid, user_uuid, task_id, prompt, answer, summary, now))
-
-        cursor.execute('''
-            UPDATE conversations 
-            SET message_count = message_count + 1, updated_at = ?
-            WHERE uuid = ?
-        ''', (now, conversation_uuid))
-
-        conn.commit()
-        return self.get_message(message_uuid)
+        return self.create_messages_bulk([Message(
+            uuid=message_uuid,
+            conversation_uuid=conversation_uuid,
+            user_uuid=user_uuid,
+            task_id=task_id,
+            prompt=prompt,
+            answer=answer,
+            summary=summary
+        )])[0]
+
+    def create_messages_bulk(self, messages: List[Message]) -> List[Message]:
+        """Insert messages and bump their conversations' counters in one transaction"""
+        if not messages:
+            return []
+
+        now = _now_iso()
+        created = [Message(
+            uuid=m.uuid,
+            conversation_uuid=m.conversation_uuid,
+            user_uuid=m.user_uuid,
+            task_id=m.task_id,
+            prompt=m.prompt,
+            answer=m.answer,
+            summary=m.summary,
+            created_at=now,
+            artifacts=[]
+        ) for m in messages]
+        rows = [(m.uuid, m.conversation_uuid, m.user_uuid, m.task_id, m.prompt, m.answer, m.summary, now)
+                for m in created]
+        per_conversation = Counter(m.conversation_uuid for m in created)
+
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(SQL_INSERT_MESSAGE, rows)
+            cursor.executemany(
+                SQL_BUMP_MESSAGE_COUNT,
+                [(count, now, conv_uuid) for conv_uuid, count in per_conversation.items()]
+            )
+            self._invalidate(self._conv_cache, *per_conversation)
+        return created
 
     def update_message(
         self,
@@ -275,9 +653,6 @@ class ConversationRepository:
         answer: Optional[str] = None,
         summary: Optional[str] = None
     ) -> Optional[Message]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
         updates = []
         params = []
 
@@ -288,52 +663,74 @@ class ConversationRepository:
             updates.append('summary = ?')
             params.append(summary)
 
-        if updates:
-            params.append(message_uuid)
-            cursor.execute(f'UPDATE messages SET {", ".join(updates)} WHERE uuid = ?', params)
-            conn.commit()
-
-        return self.get_message(message_uuid)
+        if not updates:
+            return self.get_message(message_uuid)
+
+        params.append(message_uuid)
+        with self._write_lock:
+            conn = self._get_connection()
+            rows = conn.execute(
+                f'UPDATE messages SET {", ".join(updates)} WHERE uuid = ? RETURNING {_MESSAGE_COLUMNS}',
+                params
+            ).fetchall()
+            self._invalidate(self._msg_cache, message_uuid)
+
+        return self._row_to_message(rows[0]) if rows else None
+
+    def _row_to_message(self, row) -> Message:
+        return Message(
+            uuid=row['uuid'],
+            conversation_uuid=row['conversation_uuid'],
+            user_uuid=row['user_uuid'],
+            task_id=row['task_id'],
+            prompt=row['prompt'],
+            answer=row['answer'],
+            summary=row['summary'],
+            created_at=row['created_at'],
+            artifacts=loads_json(row['artifacts_json']) if row['artifacts_json'] else []
+        )
 
-    def get_message(self, message_uuid: str) -> Optional[Message]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM messages WHERE uuid = ?', (message_uuid,))
-        row = cursor.fetchone()
-
-        if row:
-            cursor.execute('SELECT * FROM artifacts WHERE message_uuid = ?', (message_uuid,))
-            artifacts = [dict(art_row) for art_row in cursor.fetchall()]
-
-            return Message(
-                uuid=row['uuid'],
-                conversation_uuid=row['conversation_uuid'],
-                user_uuid=row['user_uuid'],
-                task_id=row['task_id'],
-                prompt=row['prompt'],
-                answer=row['answer'],
-                summary=row['summary'],
-                created_at=row['created_at'],
-                artifacts=artifacts
-            )
-        return None
+    def get_message(self, message_uuid: str, lite: bool = False) -> Optional[Message]:
+        """lite=True leaves prompt/answer as None; load them lazily with get_message_bodies"""
+        if lite:
+            return self._get_message_uncached(message_uuid, lite=True)
+        return self._get_message_cached(message_uuid)
+
+    def _get_message_cached(self, message_uuid: str) -> Optional[Message]:
+        message = self._msg_cache.get(message_uuid)
+        if message is not None:
+            return message
+
+        generation = self._msg_cache.generation
+        message = self._get_message_uncached(message_uuid)
+        # Rows still waiting for an answer are mid-stream and about to change
+        if message is not None and message.answer is not None:
+            self._msg_cache.put(message_uuid, message, generation)
+        return message
+
+    def _get_message_uncached(self, message_uuid: str, lite: bool = False) -> Optional[Message]:
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SQL_GET_MESSAGE_LITE if lite else SQL_GET_MESSAGE, (message_uuid,))
+            row = cursor.fetchone()
+
+            if row:
+                return self._row_to_message(row)
+            return None
+
+    def get_message_bodies(self, message_uuid: str) -> Optional[Dict[str, Optional[str]]]:
+        with self._reader() as conn:
+            row = conn.execute(SQL_GET_MESSAGE_BODIES, (message_uuid,)).fetchone()
+            if row:
+                return {'prompt': row['prompt'], 'answer': row['answer']}
+            return None
 
     def list_messages(self, conversation_uuid: str, limit: int = 100) -> List[Message]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT uuid FROM messages 
-            WHERE conversation_uuid = ? 
-            ORDER BY created_at ASC 
-            LIMIT ?
-        ''', (conversation_uuid, limit))
-
-        messages = []
-        for row in cursor.fetchall():
-            msg = self.get_message(row['uuid'])
-            if msg:
-                messages.append(msg)
-        return messages
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SQL_LIST_MESSAGES, (conversation_uuid, limit))
+
+            return [self._row_to_message(row) for row in cursor.fetchall()]
 
     def create_artifact(
         self,
@@ -343,43 +740,57 @@ class ConversationRepository:
         path: Optional[str] = None,
         data: Optional[Dict] = None
     ) -> Artifact:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        now = datetime.now().isoformat()
-        data_json = json.dumps(data) if data else None
-
-        cursor.execute('''
-            INSERT INTO artifacts (message_uuid, artifact_type, name, path, data, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (message_uuid, artifact_type, name, path, data_json, now))
-
-        artifact_id = cursor.lastrowid
-        conn.commit()
-
-        return Artifact(
-            id=artifact_id,
-            message_uuid=message_uuid,
+        return self.create_artifacts_bulk(message_uuid, [Artifact(
             artifact_type=artifact_type,
             name=name,
             path=path,
-            data=data_json,
-            created_at=now
-        )
+            data=dumps_json(data) if data else None
+        )])[0]
 
-    def list_artifacts(self, message_uuid: str) -> List[Artifact]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM artifacts WHERE message_uuid = ?', (message_uuid,))
+    def create_artifacts_bulk(self, message_uuid: str, items: List[Artifact]) -> List[Artifact]:
+        """Insert several artifacts for a message in one transaction.
+
+        Non-string ``data`` is serialized to JSON; a ``str`` is taken to be
+        JSON already and stored as is.
+        """
+        if not items:
+            return []
 
+        now = _now_iso()
         artifacts = []
-        for row in cursor.fetchall():
+        for item in items:
+            data = item.data
+            if data and not isinstance(data, str):
+                data = dumps_json(data)
             artifacts.append(Artifact(
-                id=row['id'],
-                message_uuid=row['message_uuid'],
-                artifact_type=row['artifact_type'],
-                name=row['name'],
-                path=row['path'],
-                data=row['data'],
-                created_at=row['created_at']
+                message_uuid=message_uuid,
+                artifact_type=item.artifact_type,
+                name=item.name,
+                path=item.path,
+                data=data or None,
+                created_at=now
             ))
-        return artifacts
\ No newline at end of file
+        rows = [(a.message_uuid, a.artifact_type, a.name, a.path, a.data, a.created_at) for a in artifacts]
+
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(rows), ARTIFACT_INSERT_BATCH):
+                batch = rows[start:start + ARTIFACT_INSERT_BATCH]
+                sql = SQL_INSERT_ARTIFACTS_RETURNING.format(values=', '.join([_ARTIFACT_ROW_PARAMS] * len(batch)))
+                params = [value for row in batch for value in row]
+                # AUTOINCREMENT ids follow VALUES order; RETURNING order itself is unspecified
+                ids = sorted(row[0] for row in cursor.execute(sql, params).fetchall())
+                for artifact, artifact_id in zip(artifacts[start:start + ARTIFACT_INSERT_BATCH], ids):
+                    artifact.id = artifact_id
+
+            cursor.executemany(SQL_APPEND_ARTIFACT_JSON, [(dumps_json(asdict(a)), message_uuid) for a in artifacts])
+            self._invalidate(self._msg_cache, message_uuid)
+
+        return artifacts
+
+    def list_artifacts(self, message_uuid: str) -> List[Artifact]:
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SQL_LIST_ARTIFACTS, (message_uuid,))
+
+            return [Artifact(*row) for row in cursor.fetchall()]
\ No newline at end of file
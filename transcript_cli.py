@@ -6,12 +6,32 @@ Usage: python transcript_cli.py [--url URL] [--user USER] [--conversation CONV_I
 
 import sys
 import os
+import time
 import uuid
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, Future
 from transcript_client import TranscriptClient
 
 
+BORDER = '=' * 79
+
+CLEAR_SCREEN = '\x1b[2J\x1b[H'
+
+# Boxes are decoration for a terminal; scripted/piped runs get plain text
+IS_TTY = sys.stdout.isatty()
+
+HEADER = """
+================================================================================
+
+              TRANSCRIPT AGENT - INTERACTIVE CONSOLE                  
+
+                    Question Answering over Transcripts                               
+
+================================================================================
+"""
+
+
 class Colors:
     """ANSI color codes for terminal output - disabled"""
     BLACK = ''
@@ -40,23 +60,20 @@ class Formatter:
     @staticmethod
     def box(text: str, title: str = "", color: str = '', width: int = 80) -> str:
         """Create a box around text - simplified"""
-        lines = text.split('\n')
+        if not IS_TTY:
+            return f"[{title.upper()}]\n{text}" if title else text
 
         # Top border
         if title:
-            top = f"={'=' * 78}"
-            content = [f" {title.upper()} ", top]
+            content = [f" {title.upper()} ", BORDER]
         else:
-            top = f"={'=' * 78}"
-            content = [top]
+            content = [BORDER]
 
         # Content
-        for line in lines:
-            content.append(line)
+        content.extend(text.split('\n'))
 
         # Bottom border
-        bottom = f"={'=' * 78}"
-        content.append(bottom)
+        content.append(BORDER)
 
         return '\n'.join(content)
 
@@ -91,6 +108,32 @@ class Formatter:
         return f"[INFO] {text}"
 
 
+class DeltaWriter:
+    """Coalesces streamed deltas into one stdout write per short window"""
+
+    def __init__(self, window: float = 0.02, max_pending: int = 256):
+        self.window = window
+        self.max_pending = max_pending
+        self._pending: List[str] = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, delta: str):
+        self._pending.append(delta)
+        self._size += len(delta)
+        now = time.monotonic()
+        if self._size > self.max_pending or now - self._last_flush > self.window:
+            self.flush(now)
+
+    def flush(self, now: Optional[float] = None):
+        if self._pending:
+            sys.stdout.write(''.join(self._pending))
+            sys.stdout.flush()
+            self._pending.clear()
+            self._size = 0
+        self._last_flush = now if now is not None else time.monotonic()
+
+
 class InteractiveCLI:
     """Interactive command-line interface for the transcript agent"""
 
@@ -113,23 +156,23 @@ class InteractiveCLI:
 
     def clear_screen(self):
         """Clear the terminal screen"""
-        os.system('clear' if os.name != 'nt' else 'cls')
+        if not IS_TTY:
+            return
+        if os.name == 'nt' or os.environ.get('TERM') == 'dumb':
+            os.system('clear' if os.name != 'nt' else 'cls')
+            return
+        # Erase + cursor home directly instead of forking a shell for `clear`
+        sys.stdout.write(CLEAR_SCREEN)
+        sys.stdout.flush()
 
     def print_header(self):
         """Print welcome header"""
-        header = """
-================================================================================
-
-              TRANSCRIPT AGENT - INTERACTIVE CONSOLE                  
-
-                    Question Answering over Transcripts                               
-
-================================================================================
-"""
-        print(header)
+        print(HEADER)
 
     def print_help(self):
         """Print help information"""
+        # The user reads the help before typing; get a connection ready meanwhile
+        self.client.preconnect()
         help_text = f"""
 > COMMANDS
 
@@ -139,6 +182,7 @@ class InteractiveCLI:
   • new        Start a new conversation (auto-generated IDs)
   • newid      Start a new conversation with custom IDs
   • load       Load transcript for current conversation
+  • batch      Ask several questions at once (one per line, blank line to send)
   • setuser    Change user ID for current session
   • streaming  Toggle streaming mode (currently: {'ON' if self.use_streaming else 'OFF'})
   • history    Show conversation history
@@ -158,10 +202,10 @@ Streaming mode: Real-time response vs polling
 """
         print(help_text)
 
-    def check_server(self) -> bool:
+    def check_server(self, health_future: Optional[Future] = None) -> bool:
         """Check if server is running"""
         try:
-            health = self.client.health_check()
+            health = health_future.result() if health_future else self.client.health_check()
 
             status_box = f"""{Formatter.success("Server is healthy and ready")}
 
@@ -190,7 +234,8 @@ Please start the server first:
             self,
             custom_user_id: Optional[str] = None,
             custom_conv_id: Optional[str] = None,
-            transcript_path: Optional[str] = None
+            transcript_path: Optional[str] = None,
+            transcript_future: Optional[Future] = None
     ):
         """Start a new conversation"""
         try:
@@ -206,42 +251,51 @@ Please start the server first:
             # Load transcript if provided
             if transcript_path:
                 self.transcript_path = transcript_path
-                self.load_transcript(transcript_path)
+                self.load_transcript(transcript_path, transcript_future)
 
             # Show conversation details
-            conv_info = f"""{Formatter.success("New conversation started")}
-
-Session Details:
-  {Formatter.bullet(f"Conversation ID: {self.conversation_id}")}
-  {Formatter.bullet(f"User ID: {self.user_id}")}
-  {Formatter.bullet(f"Transcript: {self.transcript_path if self.transcript_path else 'Not loaded'}")}
-  {Formatter.bullet(f"Status: ready")}
-"""
-            print(Formatter.box(conv_info, "NEW CONVERSATION"))
+            b = Formatter.bullet
+            lines = [
+                Formatter.success("New conversation started"),
+                "",
+                "Session Details:",
+                "  " + b(f"Conversation ID: {self.conversation_id}"),
+                "  " + b(f"User ID: {self.user_id}"),
+                "  " + b(f"Transcript: {self.transcript_path if self.transcript_path else 'Not loaded'}"),
+                "  " + b("Status: ready"),
+                "",
+            ]
+            print(Formatter.box('\n'.join(lines), "NEW CONVERSATION"))
 
         except Exception as e:
             print(Formatter.error(f"Failed to start conversation: {e}"))
 
-    def load_transcript(self, transcript_path: str):
+    def load_transcript(self, transcript_path: str, result_future: Optional[Future] = None):
         """Load transcript for current conversation"""
         if not self.conversation_id:
             print(Formatter.error("No active conversation. Start one with 'new' command"))
             return
 
         try:
-            result = self.client.load_transcript(
-                self.conversation_id,
-                transcript_path
-            )
-
-            load_info = f"""{Formatter.success("Transcript loaded successfully")}
+            if result_future:
+                result = result_future.result()
+            else:
+                result = self.client.load_transcript(
+                    self.conversation_id,
+                    transcript_path
+                )
 
-Details:
-  {Formatter.bullet(f"Conversation ID: {self.conversation_id}")}
-  {Formatter.bullet(f"Transcript Path: {transcript_path}")}
-  {Formatter.bullet(f"Transcript Length: {result['transcript_length']} characters")}
-"""
-            print(Formatter.box(load_info, "TRANSCRIPT LOADED"))
+            b = Formatter.bullet
+            lines = [
+                Formatter.success("Transcript loaded successfully"),
+                "",
+                "Details:",
+                "  " + b(f"Conversation ID: {self.conversation_id}"),
+                "  " + b(f"Transcript Path: {transcript_path}"),
+                "  " + b(f"Transcript Length: {result['transcript_length']} characters"),
+                "",
+            ]
+            print(Formatter.box('\n'.join(lines), "TRANSCRIPT LOADED"))
             self.transcript_path = transcript_path
 
         except Exception as e:
@@ -253,15 +307,18 @@ Details:
             print(Formatter.warning("No active conversation"))
             return
 
-        status_info = f"""
-Conversation Status:
-  {Formatter.bullet(f"ID: {self.conversation_id}")}
-  {Formatter.bullet(f"User: {self.user_id}")}
-  {Formatter.bullet(f"Transcript: {self.transcript_path if self.transcript_path else 'Not loaded'}")}
-  {Formatter.bullet(f"Questions Asked: {self.question_count}")}
-  {Formatter.bullet(f"Status: active")}
-"""
-        print(Formatter.box(status_info, "SESSION STATUS"))
+        b = Formatter.bullet
+        lines = [
+            "",
+            "Conversation Status:",
+            "  " + b(f"ID: {self.conversation_id}"),
+            "  " + b(f"User: {self.user_id}"),
+            "  " + b(f"Transcript: {self.transcript_path if self.transcript_path else 'Not loaded'}"),
+            "  " + b(f"Questions Asked: {self.question_count}"),
+            "  " + b("Status: active"),
+            "",
+        ]
+        print(Formatter.box('\n'.join(lines), "SESSION STATUS"))
 
     def show_history(self):
         """Show conversation history"""
@@ -269,14 +326,17 @@ Conversation Status:
             print(Formatter.warning("No conversation history yet"))
             return
 
-        history_text = f"""
+        parts = [f"""
 Total Questions: {len(self.history)}
 
-"""
+"""]
         for i, item in enumerate(self.history, 1):
-            history_text += f"\n{i}. Q: {item['question']}\n"
-            history_text += f"   A: {item['answer'][:100]}{'...' if len(item['answer']) > 100 else ''}\n"
-            history_text += f"   Time: {item['timestamp']}\n"
+            parts.append(
+                f"\n{i}. Q: {item['question']}\n"
+                f"   A: {item['answer'][:100]}{'...' if len(item['answer']) > 100 else ''}\n"
+                f"   Time: {datetime.fromtimestamp(item['timestamp']).isoformat(timespec='seconds')}\n"
+            )
+        history_text = ''.join(parts)
 
         print(Formatter.box(history_text, "CONVERSATION HISTORY"))
 
@@ -298,33 +358,41 @@ Total Questions: {len(self.history)}
                 # Use streaming mode
                 print(f"\n{Formatter.info('Streaming mode enabled')}\n")
                 answer_text = ""
+                answer_parts: List[str] = []
+                writer = DeltaWriter()
 
-                for event in self.client.ask_question_streaming(
-                        conversation_id=self.conversation_id,
-                        user_id=self.user_id,
-                        prompt=question,
-                        transcript_path=self.transcript_path
-                ):
-                    event_type = event.get('type')
-
-                    if event_type == 'delta':
-                        # Print delta in real-time
-                        delta = event.get('delta', '')
-                        print(delta, end='', flush=True)
-                        answer_text = event.get('accumulated', answer_text)
-
-                    elif event_type == 'done':
-                        answer_text = event.get('text', answer_text)
-                        print()  # New line after streaming
-
-                    elif event_type == 'error':
-                        err = event.get('error')
-                        print(f"\n{Formatter.error(f'Error: {err}')}")
-                        return
-
-                    elif event_type == 'end':
-                        break
-
+                try:
+                    for event in self.client.ask_question_streaming(
+                            conversation_id=self.conversation_id,
+                            user_id=self.user_id,
+                            prompt=question,
+                            transcript_path=self.transcript_path
+                    ):
+                        event_type = event.get('type')
+
+                        if event_type == 'delta':
+                            # Print deltas in near real-time, batched into ~20 ms writes
+                            delta = event.get('delta', '')
+                            writer.write(delta)
+                            answer_parts.append(delta)
+
+                        elif event_type == 'done':
+                            writer.flush()
+                            answer_text = event.get('text') or ''.join(answer_parts)
+                            print()  # New line after streaming
+
+                        elif event_type == 'error':
+                            writer.flush()
+                            err = event.get('error')
+                            print(f"\n{Formatter.error(f'Error: {err}')}")
+                            return
+
+                        elif event_type == 'end':
+                            break
+                finally:
+                    writer.flush()
+
+                answer_text = answer_text or ''.join(answer_parts)
                 if not answer_text:
                     print(Formatter.warning("No response received"))
                     return
@@ -355,7 +423,7 @@ Answer: {answer_text}
             self.history.append({
                 'question': question,
                 'answer': answer_text,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': time.time()
             })
 
             print()
@@ -364,26 +432,97 @@ Answer: {answer_text}
             print(Formatter.error(f"Error: {e}"))
             print()
 
+    def ask_questions_batch(self, questions: List[str]):
+        """Submit several questions in one request and wait for all answers"""
+        if not self.conversation_id:
+            print(Formatter.error("No active conversation. Start one with 'new' command"))
+            return
+
+        if not self.transcript_path:
+            print(Formatter.warning("No transcript loaded. Use 'load' command to load a transcript"))
+            return
+
+        try:
+            payloads = [
+                self.client.task_payload(
+                    self.conversation_id,
+                    self.user_id,
+                    question,
+                    self.transcript_path,
+                    stream=True
+                )
+                for question in questions
+            ]
+            print(f"\n[Processing {len(questions)} questions...]")
+            task_ids = self.client.create_tasks_batch(payloads)
+
+            # The server answers them in order; drain every stream at once so none of them is missed
+            with ThreadPoolExecutor(max_workers=min(len(task_ids), 8)) as pool:
+                futures = [pool.submit(self.client.wait_for_task, task_id) for task_id in task_ids]
+
+                for question, future in zip(questions, futures):
+                    self.question_count += 1
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(Formatter.error(f"Question #{self.question_count} failed: {e}"))
+                        continue
+
+                    answer_text = result.get('result', {}).get('text', str(result))
+                    formatted = f"""
+Question: {question}
+
+Answer: {answer_text}
+"""
+                    print(Formatter.box(formatted, f"ANSWER #{self.question_count}", width=80))
+
+                    self.history.append({
+                        'question': question,
+                        'answer': answer_text,
+                        'timestamp': time.time()
+                    })
+
+            print()
+
+        except Exception as e:
+            print(Formatter.error(f"Error: {e}"))
+            print()
+
     def run(self):
         """Run the interactive console"""
         self.clear_screen()
         self.print_header()
 
-        # Check server
-        if not self.check_server():
-            return
+        # Pick the conversation id up front so the transcript load can overlap the health check
+        if self.transcript_path and not self.conversation_id:
+            self.conversation_id = str(uuid.uuid4())
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            health_future = pool.submit(self.client.health_check)
+            transcript_future = None
+            if self.transcript_path:
+                transcript_future = pool.submit(
+                    self.client.load_transcript,
+                    self.conversation_id,
+                    self.transcript_path
+                )
 
-        # Print help
-        self.print_help()
+            # Check server
+            if not self.check_server(health_future):
+                return
 
-        # Start initial conversation if IDs provided
-        if self.conversation_id or self.transcript_path:
-            self.start_conversation(
-                custom_conv_id=self.conversation_id,
-                transcript_path=self.transcript_path
-            )
-        else:
-            print(Formatter.info("Use 'new' command to start a conversation"))
+            # Print help
+            self.print_help()
+
+            # Start initial conversation if IDs provided
+            if self.conversation_id or self.transcript_path:
+                self.start_conversation(
+                    custom_conv_id=self.conversation_id,
+                    transcript_path=self.transcript_path,
+                    transcript_future=transcript_future
+                )
+            else:
+                print(Formatter.info("Use 'new' command to start a conversation"))
 
         try:
             while True:
@@ -447,6 +586,20 @@ Answer: {answer_text}
                         else:
                             print(Formatter.warning("No path provided"))
 
+                    elif cmd == 'batch':
+                        print(f"\nBatch Questions (blank line to send)")
+                        questions = []
+                        while True:
+                            line = input(f"  {len(questions) + 1}> ").strip()
+                            if not line:
+                                break
+                            questions.append(line)
+
+                        if questions:
+                            self.ask_questions_batch(questions)
+                        else:
+                            print(Formatter.warning("No questions provided"))
+
                     elif cmd == 'setuser':
                         # Change user ID
                         print(f"\nChange User ID")
@@ -509,8 +662,22 @@ Thank you for using Transcript Agent!
             print(f"\n{Formatter.box(goodbye, 'GOODBYE')}\n")
 
 
+def run_cli(**kwargs):
+    try:
+        cli = InteractiveCLI(**kwargs)
+        cli.run()
+    except Exception as e:
+        print(f"\n[ERROR] Fatal error: {e}\n")
+        sys.exit(1)
+
+
 def main():
     """Main entry point"""
+    # Plain `python transcript_cli.py` needs no parser - skip importing and building argparse
+    if len(sys.argv) == 1:
+        run_cli()
+        return
+
     import argparse
 
     parser = argparse.ArgumentParser(
@@ -553,18 +720,13 @@ Examples:
 
     args = parser.parse_args()
 
-    try:
-        cli = InteractiveCLI(
-            base_url=args.url,
-            user_id=args.user,
-            conversation_id=args.conversation,
-            transcript_path=args.transcript,
-            use_streaming=args.stream
-        )
-        cli.run()
-    except Exception as e:
-        print(f"\n[ERROR] Fatal error: {e}\n")
-        sys.exit(1)
+    run_cli(
+        base_url=args.url,
+        user_id=args.user,
+        conversation_id=args.conversation,
+        transcript_path=args.transcript,
+        use_streaming=args.stream
+    )
 
 
 if __name__ == "__main__":
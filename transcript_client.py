@@ -5,12 +5,65 @@ Client for interacting with the Transcript Agent API
 Supports streaming responses
 """
 
+import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+import socket
+import sys
+import threading
 import time
 import uuid
-import json
+from collections import OrderedDict
 from typing import Dict, Any, Optional, List, Iterator
 
+from agent.helper import dumps_json, loads_json
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Task states that never change again, so their status responses can be cached
+TERMINAL_STATUSES = frozenset({'SUCCESS', 'FAILED'})
+
+# The \r-redrawn progress line is only useful on a terminal; piped output stays clean
+IS_TTY = sys.stdout.isatty()
+
+# Pre-encoded "Processing..." suffixes, indexed by the dot count
+PROGRESS_DOTS = [b'   ', b'.  ', b'.. ', b'...']
+
+
+def _write_progress(dots: int, elapsed: int):
+    """Redraw the progress line with one bytes write"""
+    out = getattr(sys.stdout, 'buffer', None)
+    if out is None:
+        print(f"\rProcessing{'.' * dots}{' ' * (3 - dots)} ({elapsed}s)", end='', flush=True)
+        return
+    # Push out anything print() buffered first so the two layers don't interleave
+    sys.stdout.flush()
+    out.write(b'\rProcessing' + PROGRESS_DOTS[dots] + b' (%ds)' % elapsed)
+    out.flush()
+
+
+class APIError(Exception):
+    """API request failure; keeps the HTTP status so callers can react to specific codes"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class NoDelayAdapter(HTTPAdapter):
+    """HTTPAdapter whose sockets have Nagle disabled and TCP keepalive on"""
+
+    socket_options = HTTPConnection.default_socket_options + [
+        (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ]
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault('socket_options', self.socket_options)
+        super().init_poolmanager(*args, **kwargs)
+
 
 class TranscriptClient:
     """Client for interacting with the Transcript Agent API"""
@@ -21,7 +74,21 @@ class TranscriptClient:
     ):
         self.base_url = base_url.rstrip('/')
         self.session = requests.Session()
+        # Keep warm connections for the create/status/stream calls; retry only idempotent methods on gateway errors
+        adapter = NoDelayAdapter(
+            pool_connections=4,
+            pool_maxsize=32,
+            max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.timeout = 300  # 5 minutes default timeout
+        self._finished_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._finished_cache_size = 256
+        # Batch questions wait on tasks from several threads
+        self._finished_lock = threading.Lock()
+        # conversation_id -> ((path, mtime_ns, size), server-issued transcript handle)
+        self._transcript_handles: Dict[str, Any] = {}
 
     def _request(
             self,
@@ -37,19 +104,32 @@ class TranscriptClient:
             response = self.session.request(
                 method,
                 url,
-                json=data,
+                data=dumps_json(data).encode('utf-8') if data is not None else None,
+                headers=JSON_HEADERS if data is not None else None,
                 params=params,
                 timeout=self.timeout
             )
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"API request failed: {str(e)}")
+            return loads_json(response.content)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            status_code = getattr(getattr(e, 'response', None), 'status_code', None)
+            raise APIError(f"API request failed: {str(e)}", status_code)
 
     def health_check(self) -> Dict[str, Any]:
         """Check API health"""
         return self._request('GET', '/health')
 
+    def preconnect(self):
+        """Warm a pooled connection in the background so the next real request skips the handshake"""
+        threading.Thread(target=self._warm_connection, daemon=True).start()
+
+    def _warm_connection(self):
+        try:
+            # Reading the body returns the connection to the pool
+            self.session.get(f"{self.base_url}/health", timeout=2).content
+        except requests.exceptions.RequestException:
+            pass
+
     def load_transcript(
             self,
             conversation_id: str,
@@ -62,15 +142,15 @@ class TranscriptClient:
         }
         return self._request('POST', '/transcript/load', params=params)
 
-    def create_task(
+    def task_payload(
             self,
             conversation_id: str,
             user_id: str,
             prompt: str,
             transcript_path: Optional[str] = None,
             stream: bool = False
-    ) -> str:
-        """Create a new task and return task_id"""
+    ) -> Dict[str, Any]:
+        """Build the request body for a task"""
 
         message_id = str(uuid.uuid4())
 
@@ -92,22 +172,94 @@ class TranscriptClient:
         if transcript_path:
             data["transcript_path"] = transcript_path
 
+        return data
+
+    def create_task(
+            self,
+            conversation_id: str,
+            user_id: str,
+            prompt: str,
+            transcript_path: Optional[str] = None,
+            stream: bool = False
+    ) -> str:
+        """Create a new task and return task_id"""
+        data = self.task_payload(conversation_id, user_id, prompt, transcript_path, stream)
+
+        file_key = self._transcript_key(transcript_path) if transcript_path else None
+        cached = self._transcript_handles.get(conversation_id)
+        if file_key is not None and cached and cached[0] == file_key:
+            # Server already has this exact file for the conversation - reference it instead
+            del data["transcript_path"]
+            data["transcript_handle"] = cached[1]
+            try:
+                result = self._request('POST', '/transcript/task', data=data)
+                return result['task_id']
+            except APIError as e:
+                if e.status_code != 409:
+                    raise
+                # Server forgot the handle (restart/reset) - fall back to sending the path
+                self._transcript_handles.pop(conversation_id, None)
+                del data["transcript_handle"]
+                data["transcript_path"] = transcript_path
+
         result = self._request('POST', '/transcript/task', data=data)
+        if file_key is not None and result.get('transcript_handle'):
+            self._transcript_handles[conversation_id] = (file_key, result['transcript_handle'])
         return result['task_id']
 
+    @staticmethod
+    def _transcript_key(transcript_path: str):
+        """Identity of a local transcript file; None if it only exists on the server side"""
+        try:
+            st = os.stat(transcript_path)
+        except OSError:
+            return None
+        return transcript_path, st.st_mtime_ns, st.st_size
+
+    def create_tasks_batch(self, payloads: List[Dict[str, Any]]) -> List[str]:
+        """Submit several tasks in one request; falls back to one request per task on older servers"""
+        try:
+            return self._request('POST', '/transcript/tasks', data={"tasks": payloads})['task_ids']
+        except APIError as e:
+            if e.status_code != 404:
+                raise
+
+        return [self._request('POST', '/transcript/task', data=payload)['task_id'] for payload in payloads]
+
     def get_task_status(self, task_id: str) -> Dict[str, Any]:
         """Get task status and result"""
+        with self._finished_lock:
+            cached = self._finished_cache.get(task_id)
+            if cached is not None:
+                self._finished_cache.move_to_end(task_id)
+                return cached
+
+        result = self._get_task_status_uncached(task_id)
+        if result.get('status') in TERMINAL_STATUSES:
+            with self._finished_lock:
+                self._finished_cache[task_id] = result
+                if len(self._finished_cache) > self._finished_cache_size:
+                    self._finished_cache.popitem(last=False)
+        return result
+
+    def _get_task_status_uncached(self, task_id: str) -> Dict[str, Any]:
         return self._request('GET', f'/transcript/task/{task_id}')
 
     def poll_task(
             self,
             task_id: str,
-            poll_interval: int = 2,
+            poll_interval: float = 1.0,
             show_progress: bool = False
     ) -> Dict[str, Any]:
-        """Poll task until completion with optional progress indicator"""
+        """Poll task until completion with optional progress indicator
+
+        Backs off exponentially from 50 ms up to poll_interval, so short tasks return almost immediately.
+        """
+        show_progress = show_progress and IS_TTY
         start_time = time.time()
+        last_elapsed = -1
         dots = 0
+        delay = 0.05
 
         while time.time() - start_time < self.timeout:
             result = self.get_task_status(task_id)
@@ -121,14 +273,101 @@ class TranscriptClient:
                 return result
 
             if show_progress:
-                dots = (dots + 1) % 4
                 elapsed = int(time.time() - start_time)
-                print(f"\rProcessing{'.' * dots}{' ' * (3 - dots)} ({elapsed}s)", end='', flush=True)
+                if elapsed != last_elapsed:
+                    last_elapsed = elapsed
+                    dots = (dots + 1) % 4
+                    _write_progress(dots, elapsed)
 
-            time.sleep(poll_interval)
+            time.sleep(delay)
+            delay = min(delay * 1.7, poll_interval)
 
         raise TimeoutError(f"Task did not complete within {self.timeout} seconds")
 
+    def _open_stream(self, task_id: str) -> requests.Response:
+        url = f"{self.base_url}/transcript/task/{task_id}/stream"
+        return self.session.get(url, stream=True, timeout=self.timeout)
+
+    def _iter_sse(self, response: requests.Response) -> Iterator[Dict[str, Any]]:
+        """Parse Server-Sent Events until the server's end event"""
+        buf = bytearray()
+
+        # chunk_size=None hands over each chunk as it arrives, so deltas aren't held back to fill a buffer
+        for chunk in response.iter_content(chunk_size=None):
+            buf += chunk
+
+            # Events are separated by a blank line; decode straight from bytes without per-line str copies
+            while (end := buf.find(b'\n\n')) >= 0:
+                frame = bytes(buf[:end])
+                del buf[:end + 2]
+
+                for line in frame.split(b'\n'):
+                    # SSE format: "data: {...}"
+                    if not line.startswith(b'data: '):
+                        continue
+                    try:
+                        event = loads_json(line[6:])
+                    except ValueError:
+                        continue
+
+                    yield event
+
+                    # Stop if we receive end event
+                    if event.get('type') == 'end':
+                        return
+
+    def _consume_sse(self, task_id: str, show_progress: bool = False) -> Optional[Dict[str, Any]]:
+        """Drain a task's SSE stream into a task-status shaped result.
+
+        None if the server can't stream the task, or the stream ended before its "done" event
+        (dropped connection, proxy timeout, server restart); the caller then polls instead.
+        """
+        show_progress = show_progress and IS_TTY
+        try:
+            # Closing the response hands the connection back to the session pool
+            with self._open_stream(task_id) as response:
+                if response.status_code == 404:
+                    return None
+                response.raise_for_status()
+
+                start_time = time.time()
+                last_elapsed = -1
+                dots = 0
+                text = None
+
+                for event in self._iter_sse(response):
+                    event_type = event.get('type')
+
+                    if event_type == 'done':
+                        text = event.get('text') or ''
+                    elif event_type == 'error':
+                        raise Exception(f"Task failed: {event.get('error', 'Unknown error')}")
+
+                    if show_progress:
+                        elapsed = int(time.time() - start_time)
+                        if elapsed != last_elapsed:
+                            last_elapsed = elapsed
+                            dots = (dots + 1) % 4
+                            _write_progress(dots, elapsed)
+
+        except requests.exceptions.RequestException as e:
+            status_code = getattr(getattr(e, 'response', None), 'status_code', None)
+            raise APIError(f"API request failed: {str(e)}", status_code)
+
+        # Deltas alone may be a truncated answer; only "done" carries the complete text
+        if text is None:
+            return None
+        return {'status': 'SUCCESS', 'result': {'text': text}}
+
+    def wait_for_task(self, task_id: str, show_progress: bool = False) -> Dict[str, Any]:
+        """Wait for a task created with stream=True"""
+        result = self._consume_sse(task_id, show_progress=show_progress)
+
+        # Fallback: stream already gone (task finished first), not offered by the server, or cut off before "done"
+        if result is None:
+            result = self.poll_task(task_id, show_progress=show_progress)
+        return result
+
     def ask_question(
             self,
             conversation_id: str,
@@ -139,18 +378,18 @@ class TranscriptClient:
     ) -> Dict[str, Any]:
         """Ask a question and wait for result"""
 
-        # Create task
+        # Always stream: the answer arrives as soon as it's done instead of on the next poll tick
         task_id = self.create_task(
             conversation_id,
             user_id,
             prompt,
-            transcript_path
+            transcript_path,
+            stream=True
         )
 
-        # Poll for result
-        result = self.poll_task(task_id, show_progress=show_progress)
+        result = self.wait_for_task(task_id, show_progress=show_progress)
 
-        if show_progress:
+        if show_progress and IS_TTY:
             print("\r" + " " * 50 + "\r", end='', flush=True)
 
         return result
@@ -174,29 +413,12 @@ class TranscriptClient:
         )
 
         # Stream results
-        url = f"{self.base_url}/transcript/task/{task_id}/stream"
-
         try:
-            response = self.session.get(url, stream=True, timeout=self.timeout)
-            response.raise_for_status()
-
-            # Parse Server-Sent Events
-            for line in response.iter_lines():
-                if line:
-                    line_str = line.decode('utf-8')
+            # Also closed when the caller stops iterating early
+            with self._open_stream(task_id) as response:
+                response.raise_for_status()
 
-                    # SSE format: "data: {...}"
-                    if line_str.startswith('data: '):
-                        data_str = line_str[6:]  # Remove "data: " prefix
-                        try:
-                            event = json.loads(data_str)
-                            yield event
-
-                            # Stop if we receive end event
-                            if event.get('type') == 'end':
-                                break
-                        except json.JSONDecodeError:
-                            continue
+                yield from self._iter_sse(response)
 
         except requests.exceptions.RequestException as e:
             yield {
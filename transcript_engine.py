@@ -1,30 +1,267 @@
 import os
+import asyncio
 import hashlib
-import json
+import importlib.util
+import math
+import mmap
+import threading
 import time
-import numpy as np
+from collections import OrderedDict
+from itertools import groupby
+from pathlib import Path
 from openai import OpenAI
 from dotenv import load_dotenv
-from agent.helper import parse_json
+from agent.helper import parse_json, dumps_json, loads_json
 import httpx
 
 load_dotenv()
 
+# Labelled Deepgram results by audio hash; lives under transcripts/ so a full clear drops it too
+CACHE_DIR = Path(__file__).resolve().parent / "transcripts" / ".cache"
+
+# Process-wide pooled clients, so repeat requests reuse warm keep-alive connections instead of a new TLS handshake each.
+_DG_TIMEOUT = httpx.Timeout(600.0, connect=30.0)
+_HTTP2 = importlib.util.find_spec("h2") is not None
+# For the asyncio.run() shim: every call gets a fresh loop, which an async pool can't outlive
+_DG_CLIENT = httpx.Client(
+    timeout=_DG_TIMEOUT,
+    http2=_HTTP2,
+    limits=httpx.Limits(max_connections=32, max_keepalive_connections=8),
+)
+# For callers on one long-lived loop (the service); they pass it in as client=
+DEEPGRAM_CLIENT = httpx.AsyncClient(
+    timeout=_DG_TIMEOUT,
+    http2=_HTTP2,
+    limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+)
+UPLOAD_CHUNK_SIZE = 1 << 20
+DEEPGRAM_URL = "https://api.deepgram.com/v1/listen"
+_openai_client = None
+# Transcript writes still in flight on the running loop; see flush_pending_writes
+_pending_writes: set = set()
+
+
+def _openai() -> OpenAI:
+    # Built on first use so importing the module doesn't require OPENAI_API_KEY
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = OpenAI()
+    return _openai_client
+
+
+# Directories already created this run; forget_ensured_dirs() after deleting any of them
+_ENSURED_DIRS: set = set()
+
+
+def ensure_dir(path) -> None:
+    key = os.fspath(path)
+    if key not in _ENSURED_DIRS:
+        os.makedirs(key, exist_ok=True)
+        _ENSURED_DIRS.add(key)
+
+
+def forget_ensured_dirs() -> None:
+    _ENSURED_DIRS.clear()
+
+
+SUGGESTIONS_CACHE_SIZE = 128
+_suggestions_cache: "OrderedDict[str, list]" = OrderedDict()
+# Audio pool workers and the transcription path both touch the cache; every read, relink and evict holds this
+_suggestions_lock = threading.Lock()
+
 
 def calculate_file_hash(file_bytes):
     return hashlib.md5(file_bytes).hexdigest()
 
 
-def process_audio_with_deepgram(audio_bytes, output_path, status_callback=None):
-    def update_stage(stage, percent):
-        if status_callback:
-            status_callback(stage, percent)
+def calculate_file_hash_stream(source, chunk_size: int = 1 << 20, copy_to=None) -> str:
+    """Same digest as calculate_file_hash, from a path (mmap'd) or a binary file object read in chunks.
+    With copy_to (a writable binary file), a file object's chunks are also written there in the same pass."""
+    h = hashlib.md5()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    h.update(mapped)
+        return h.hexdigest()
+
+    if copy_to is None and hasattr(hashlib, "file_digest"):
+        # 3.11+: hashes via readinto on one reused buffer, GIL released inside the digest
+        return hashlib.file_digest(source, "md5").hexdigest()
+
+    # One preallocated buffer filled with readinto, rather than a new bytes object per chunk
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    while size := source.readinto(buf):
+        h.update(view[:size])
+        if copy_to is not None:
+            copy_to.write(view[:size])
+    return h.hexdigest()
+
+
+def _load_cached_result(file_hash):
+    try:
+        return loads_json((CACHE_DIR / f"{file_hash}.json").read_bytes())
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cached_result(file_hash, result):
+    ensure_dir(CACHE_DIR)
+    cache_path = CACHE_DIR / f"{file_hash}.json"
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(dumps_json(result), encoding="utf-8")
+    # Atomic swap so a concurrent reader never sees a half-written file
+    os.replace(tmp_path, cache_path)
+
+
+SPEAKER_SAMPLE_CHARS = 800
+
+
+def _prompt_json(data) -> str:
+    # Compact JSON rather than Python repr: valid for the model and fewer tokens
+    return dumps_json(data)
+
+
+def _speaker_samples(result) -> dict:
+    """First ~SPEAKER_SAMPLE_CHARS of text per distinct speaker - enough to name them, a fraction of the tokens"""
+    samples = {}
+    sizes = {}
+    for r in result:
+        speaker = r['speaker']
+        size = sizes.get(speaker, 0)
+        if size < SPEAKER_SAMPLE_CHARS:
+            samples.setdefault(speaker, []).append(r['text'])
+            sizes[speaker] = size + len(r['text']) + 1
+    return {speaker: ' '.join(texts)[:SPEAKER_SAMPLE_CHARS] for speaker, texts in samples.items()}
+
+
+_SPEAKER_REF_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "required": ["id", "name"],
+    "properties": {"id": {"type": "string"}, "name": {"type": "string"}},
+}
+
+# One structured response covering every LLM step of the pipeline
+TRANSCRIPT_LABELS_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "required": ["speakers", "corrections", "suggestions"],
+    "properties": {
+        "speakers": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "additionalProperties": False,
+                "required": ["id", "name", "role"],
+                "properties": {
+                    "id": {"type": "string"},
+                    "name": {"type": "string"},
+                    "role": {"type": "string"},
+                },
+            },
+        },
+        "corrections": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "additionalProperties": False,
+                "required": ["utterance", "old_speaker", "new_speaker", "explanation"],
+                "properties": {
+                    "utterance": {"type": "integer"},
+                    "old_speaker": _SPEAKER_REF_SCHEMA,
+                    "new_speaker": _SPEAKER_REF_SCHEMA,
+                    "explanation": {"type": "string"},
+                },
+            },
+        },
+        "suggestions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "additionalProperties": False,
+                "required": ["id", "label", "prompt"],
+                "properties": {
+                    "id": {"type": "integer"},
+                    "label": {"type": "string"},
+                    "prompt": {"type": "string"},
+                },
+            },
+        },
+    },
+}
+
+SUGGESTION_RULES = '''Rules:
+- "label" should be 2-4 words with an emoji at the start
+- "prompt" should be a clear question or action request
+- Make suggestions relevant to the transcript content'''
+
+
+def _utterance_rows(result) -> list:
+    """[index, speaker, text] per utterance: the text the labelling needs, without timestamps or key names"""
+    return [[i, r['speaker'], r['text']] for i, r in enumerate(result)]
+
+
+async def _label_transcript(result) -> dict:
+    """Speaker names, speaker corrections and suggestions from a single Responses API call"""
+    samples = _prompt_json(_speaker_samples(result))
+    payload = _prompt_json(_utterance_rows(result))
+    prompt = f'''You are given a sample of each speaker's speech and a diarized transcript as a JSON list of utterances, each [utterance index, speaker id, text].
+
+1. speakers: define names and roles of every speaker id, from the samples.
+2. corrections: identify mistakes in the speakers <> transcript connection. Return the utterance index exactly as given, the current speaker and the proposed one, and explain the substitution. The most common mistake when the speaker asks themself.
+3. suggestions: suggest 5 most useful actions/questions for the user about this transcript.
+{SUGGESTION_RULES}
+
+Speakers and sample utterances:
+{samples}
+
+Transcript:
+{payload}'''
+    res = await asyncio.to_thread(
+        _openai().responses.create,
+        model="gpt-5.2",
+        input=[{"role": "user", "content": prompt}],
+        reasoning={"effort": "medium"},
+        text={"format": {
+            "type": "json_schema",
+            "name": "transcript_labels",
+            "schema": TRANSCRIPT_LABELS_SCHEMA,
+            "strict": True,
+        }},
+    )
+    return parse_json(res.output_text)
+
+
+def _post_to_deepgram(audio, headers, params):
+    # A path is streamed from disk in chunks; only raw bytes are held in memory whole
+    if isinstance(audio, (str, os.PathLike)):
+        with open(audio, "rb") as f:
+            return _DG_CLIENT.post(DEEPGRAM_URL, headers=headers, params=params, content=f)
+    return _DG_CLIENT.post(DEEPGRAM_URL, headers=headers, params=params, content=audio)
+
+
+async def _aiter_file(path):
+    with open(path, "rb") as f:
+        while chunk := await asyncio.to_thread(f.read, UPLOAD_CHUNK_SIZE):
+            yield chunk
+
 
+async def _post_to_deepgram_async(client: httpx.AsyncClient, audio, headers, params):
+    content = _aiter_file(audio) if isinstance(audio, (str, os.PathLike)) else audio
+    return await client.post(DEEPGRAM_URL, headers=headers, params=params, content=content)
+
+
+def _utterance_speaker(utterance) -> str:
+    return str(utterance.get("speaker", 0))
+
+
+async def _transcribe_and_label(audio, update_stage, client=None):
+    """Deepgram transcription plus LLM labelling; returns (result, speakers_ok, suggestions)"""
     update_stage("Connecting to Deepgram...", 10)
 
     api_key = os.getenv("DEEPGRAM_KEY")
-    client_openai = OpenAI()
-
     update_stage("Transcribing audio (this may take a few minutes)...", 20)
 
     # Используем httpx напрямую с большим timeout
@@ -41,65 +278,42 @@ def process_audio_with_deepgram(audio_bytes, output_path, status_callback=None):
         "utterances": "true",
     }
 
-    # Timeout: 10 минут для больших файлов
-    timeout = httpx.Timeout(600.0, connect=30.0)
-
-    with httpx.Client(timeout=timeout) as client:
-        response = client.post(
-            "https://api.deepgram.com/v1/listen",
-            headers=headers,
-            params=params,
-            content=audio_bytes,
-        )
-        response.raise_for_status()
-        data = response.json()
+    # Timeout: 10 минут для больших файлов (см. _DG_TIMEOUT)
+    if client is not None:
+        response = await _post_to_deepgram_async(client, audio, headers, params)
+    else:
+        response = await asyncio.to_thread(_post_to_deepgram, audio, headers, params)
+    response.raise_for_status()
+    data = response.json()
 
     update_stage("Processing transcription...", 40)
 
-    result = []
     results = data.get("results", {})
     utterances = results.get("utterances", [])
 
-    if utterances:
-        current_chunk = None
-
-        for utterance in utterances:
-            speaker = str(utterance.get("speaker", 0))
-            text = utterance.get("transcript", "")
-            start = utterance.get("start", 0)
-            end = utterance.get("end", 0)
-
-            if current_chunk and current_chunk["speaker"] == speaker:
-                current_chunk["text"] += " " + text
-                current_chunk["end"] = end
-            else:
-                if current_chunk:
-                    result.append(current_chunk)
-                current_chunk = {
-                    "speaker": speaker,
-                    "start": start,
-                    "end": end,
-                    "text": text
-                }
-        if current_chunk:
-            result.append(current_chunk)
+    # Merge runs of consecutive same-speaker utterances; each chunk's text is joined once
+    result = [
+        {
+            "speaker": speaker,
+            "start": run[0].get("start", 0),
+            "end": run[-1].get("end", 0),
+            "text": " ".join([u.get("transcript", "") for u in run]),
+        }
+        for speaker, group in groupby(utterances, key=_utterance_speaker)
+        for run in (list(group),)
+    ]
 
     update_stage("AI identifying speakers...", 50)
 
-    # Identify speakers
-    prompt = f"Define names and roles of speakers for Transcript:\n{str(result)}\n\n==========\nReturn json {{'speakers': ['id': <id of speaker from transcript>, 'name': <>, 'role': <>]}}"
-
+    speakers_ok = False
+    speaker_map = {}
     try:
-        res = client_openai.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="gpt-5.2",
-            reasoning_effort='medium'
-        )
-        speakers_data = parse_json(res.choices[0].message.content)
+        labels = await _label_transcript(result)
 
         update_stage("Applying speaker names...", 60)
 
-        speaker_map = {str(s['id']): s['name'] for s in speakers_data.get('speakers', [])}
+        speaker_map = {str(s['id']): s['name'] for s in labels.get('speakers', [])}
+        speakers_ok = True
 
         for r in result:
             sp_id = str(r['speaker'])
@@ -107,64 +321,126 @@ def process_audio_with_deepgram(audio_bytes, output_path, status_callback=None):
 
     except Exception as e:
         print(f"Speaker identification failed: {e}")
+        labels = {}
         for r in result:
             r['name'] = f"Speaker {r.get('speaker', '?')}"
 
     update_stage("Formatting transcript...", 70)
 
     try:
-        prompt = f'''Identify mistakes in the speakers <> transcript connection in the transcript. 
-        You have to return the transcript timeframe, the current id, name of speaker and the proposed ones. Provide explanation.
-        The most common mistake when the speaker asks themself. 
-        Transcript:
-        {result}
-        ==========
-        Return json {{['start': <start time point>, 'end': <start time point>, 
-                       'old_speaker': {{"id": <id of current speaker>, "name": <name of current speaker>}}, 
-                       'new_speaker': {{"id": <id of proposed speaker>, "name": <name of proposed speaker>}}, 'explanation': <explain the substitution>]}}'''
-        res = client_openai.chat.completions.create(messages=[{"role": "user", "content": prompt}],
-                                                    model="gpt-5.2", reasoning_effort="medium")
-        errors = parse_json(res.choices[0].message.content)
-
-        for err in errors:
+        for err in labels.get('corrections', []):
             print(err)
-            for res in result:
-                if res['start'] == err['start'] and res['end'] == err['end']:
-                    res['id'] = err['new_speaker']['id']
-                    res['name'] = err['new_speaker']['name']
-                    break
+            new_speaker = err['new_speaker']
+            index = err['utterance']
+            # Corrections point at utterances by their index in the prompt; ignore any out of range
+            res = result[index] if 0 <= index < len(result) else None
+            if res is not None:
+                res['id'] = new_speaker['id']
+                res['name'] = speaker_map.get(str(new_speaker['id']), new_speaker['name'])
     except Exception as e:
         print(f"Speaker Correction failed: {e}")
 
+    suggestions = labels.get('suggestions') or []
 
-    update_stage("Formatting transcript...", 90)
+    return result, speakers_ok, suggestions
 
-    f_tr = []
-    for r in result:
-        st = r['start'] / 60
-        ed = r['end'] / 60
-        st_h = int(st // 60)
-        ed_h = int(ed // 60)
-        st_m = int(np.ceil(st - st_h * 60))
-        ed_m = int(np.ceil(ed - ed_h * 60))
-        start_fmt = f"{st_h:02d}:{st_m:02d}"
-        end_fmt = f"{ed_h:02d}:{ed_m:02d}"
 
-        name = r.get('name', r.get('speaker', 'Unknown'))
-        text = f"[{start_fmt} - {end_fmt} ({name})]\n {r['text']}\n\n"
-        f_tr.append(text)
+def _format_utterance(r) -> str:
+    # Round up to whole minutes, then split into HH:MM with plain int math
+    st_h, st_m = divmod(math.ceil(r['start'] / 60), 60)
+    ed_h, ed_m = divmod(math.ceil(r['end'] / 60), 60)
+    name = r.get('name', r.get('speaker', 'Unknown'))
+    return f"[{st_h:02d}:{st_m:02d} - {ed_h:02d}:{ed_m:02d} ({name})]\n {r['text']}\n\n"
+
+
+def _write_transcript(output_path, text):
+    output_file = Path(output_path)
+    ensure_dir(output_file.parent)
+    output_file.write_text(text, encoding="utf-8")
+
 
-    final_transcript = '\n'.join(f_tr)
+async def flush_pending_writes():
+    """Wait for transcript files still being written on this loop"""
+    pending = [t for t in _pending_writes if t.get_loop() is asyncio.get_running_loop()]
+    if pending:
+        await asyncio.gather(*pending)
 
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(final_transcript)
+
+def process_audio_with_deepgram(audio, output_path, status_callback=None, file_hash=None):
+    """Sync entry point for worker threads; async callers should await process_audio_with_deepgram_async"""
+    async def run():
+        transcript = await process_audio_with_deepgram_async(audio, output_path, status_callback, file_hash)
+        # asyncio.run would cancel the write on exit, and sync callers expect the file to be there
+        await flush_pending_writes()
+        return transcript
+
+    return asyncio.run(run())
+
+
+async def process_audio_with_deepgram_async(audio, output_path, status_callback=None, file_hash=None, client=None):
+    """audio is the raw bytes or a path to the file; a path is uploaded to Deepgram without loading it into memory.
+    client: an httpx.AsyncClient bound to the caller's loop (e.g. DEEPGRAM_CLIENT); without one the shared
+    sync client is used from a worker thread."""
+    def update_stage(stage, percent):
+        if status_callback:
+            status_callback(stage, percent)
+
+    if not file_hash:
+        if isinstance(audio, (str, os.PathLike)):
+            file_hash = await asyncio.to_thread(calculate_file_hash_stream, audio)
+        else:
+            file_hash = calculate_file_hash(audio)
+    result = await asyncio.to_thread(_load_cached_result, file_hash)
+
+    suggestions = []
+    if result is not None:
+        update_stage("Using cached transcription...", 70)
+    else:
+        result, speakers_ok, suggestions = await _transcribe_and_label(audio, update_stage, client)
+        # Fallback "Speaker N" names aren't worth keeping - retry the LLM next time instead
+        if speakers_ok:
+            await asyncio.to_thread(_save_cached_result, file_hash, result)
+
+    update_stage("Formatting transcript...", 90)
+
+    final_transcript = '\n'.join([_format_utterance(r) for r in result])
+
+    # The caller gets the text right away; the file is flushed from a worker thread meanwhile
+    write_task = asyncio.create_task(asyncio.to_thread(_write_transcript, output_path, final_transcript))
+    _pending_writes.add(write_task)
+    write_task.add_done_callback(_pending_writes.discard)
+
+    # Suggestions came with the labelling call; analyze_transcript_suggestions picks them up from the cache
+    if suggestions:
+        _remember_suggestions(final_transcript, suggestions)
 
     update_stage("Transcript saved!", 80)
 
     return final_transcript
 
 
+def _suggestions_key(transcript_text: str) -> str:
+    return hashlib.md5(transcript_text.encode("utf-8")).hexdigest()
+
+
+def _remember_suggestions(transcript_text: str, suggestions: list):
+    digest = _suggestions_key(transcript_text)
+    with _suggestions_lock:
+        _suggestions_cache[digest] = suggestions
+        _suggestions_cache.move_to_end(digest)
+        if len(_suggestions_cache) > SUGGESTIONS_CACHE_SIZE:
+            _suggestions_cache.popitem(last=False)
+
+
+def _cached_suggestions(transcript_text: str):
+    digest = _suggestions_key(transcript_text)
+    with _suggestions_lock:
+        cached = _suggestions_cache.get(digest)
+        if cached is not None:
+            _suggestions_cache.move_to_end(digest)
+    return cached
+
+
 def analyze_transcript_suggestions(transcript_text: str, status_callback=None) -> list:
     """
     Генерирует ТОЛЬКО ВОПРОСЫ (Prompts), которые пользователь может кликнуть.
@@ -173,11 +449,13 @@ def analyze_transcript_suggestions(transcript_text: str, status_callback=None) -
         print("⚠ Transcript too short for suggestions")
         return []
 
+    cached = _cached_suggestions(transcript_text)
+    if cached is not None:
+        return list(cached)
+
     if status_callback:
         status_callback("Generating analysis suggestions...", 90)
 
-    client_openai = OpenAI()
-
     prompt = f'''Analyze this transcript and suggest 5 most useful actions/questions for the user.
 
 Transcript (first 10000 chars):
@@ -190,15 +468,12 @@ Return JSON array with exactly this format:
   ...
 ]
 
-Rules:
-- "label" should be 2-4 words with an emoji at the start
-- "prompt" should be a clear question or action request
-- Make suggestions relevant to the transcript content
+{SUGGESTION_RULES}
 - Return ONLY valid JSON array, no other text
 '''
 
     try:
-        res = client_openai.chat.completions.create(
+        res = _openai().chat.completions.create(
             messages=[{"role": "user", "content": prompt}],
             model="gpt-4.1",
         )
@@ -206,7 +481,8 @@ Rules:
 
         if isinstance(actions, list) and len(actions) > 0:
             print(f"✓ Generated {len(actions)} suggestions")
-            return actions
+            _remember_suggestions(transcript_text, actions)
+            return list(actions)
         else:
             print(f"⚠ Invalid suggestions format: {type(actions)}")
             return []
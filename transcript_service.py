@@ -1,23 +1,31 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Callable
 from dataclasses import asdict
-from datetime import datetime
 import uvicorn
 import asyncio
 import uuid
 from pathlib import Path
-import json
+import mmap
 import os
 import shutil
-import glob
-
-from transcript_engine import calculate_file_hash, process_audio_with_deepgram, analyze_transcript_suggestions
+import importlib.util
+import concurrent.futures
+import functools
+import operator
+import threading
+import time
+from collections import OrderedDict
+
+from transcript_engine import (
+    calculate_file_hash_stream, process_audio_with_deepgram_async, analyze_transcript_suggestions,
+    ensure_dir, forget_ensured_dirs, flush_pending_writes, DEEPGRAM_CLIENT,
+)
 
 from agent.agent_meta import create_agent
-from agent.helper import AgentSession
+from agent.helper import AgentSession, dumps_json, loads_json, orjson
 from agents import Runner, SQLiteSession
 
 try:
@@ -47,11 +55,24 @@ class TaskRequest(BaseModel):
     conversation: ConversationData
     message: MessageData
     transcript_path: Optional[str] = None
+    # Returned by a previous task that sent transcript_path; lets clients skip re-sending it
+    transcript_handle: Optional[str] = None
     stream: Optional[bool] = False
 
 
 class TaskResponse(BaseModel):
     task_id: str
+    transcript_handle: Optional[str] = None
+
+
+class TaskBatchRequest(BaseModel):
+    tasks: List[TaskRequest]
+
+
+class TaskBatchResponse(BaseModel):
+    task_ids: List[str]
+    # Same order as task_ids; None where the task sent neither a path nor a handle
+    transcript_handles: List[Optional[str]] = []
 
 
 class TaskStatus(BaseModel):
@@ -60,7 +81,232 @@ class TaskStatus(BaseModel):
     failure: Optional[str] = None
 
 
-processing_status: Dict[str, Any] = {}
+class BoundedCache(OrderedDict):
+    """OrderedDict LRU with an optional sliding TTL; on_evict(key, value) runs for entries it drops.
+
+    Worker threads (upload status callbacks, _finish_processing) write some of these while the janitor
+    sweeps them on the event loop, so every access that reorders or removes links holds one lock.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, on_evict=None):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._expires: Dict[Any, float] = {}
+        # Reentrant: get() goes through __contains__ and __getitem__
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+            self._touch(key)
+            while len(self) > self.maxsize:
+                self._evict(*self.popitem(last=False))
+
+    def __contains__(self, key):
+        with self._lock:
+            present = super().__contains__(key) and not self._expired(key)
+            if present:
+                self.hits += 1
+                self._touch(key)
+            else:
+                self.misses += 1
+            return present
+
+    def __getitem__(self, key):
+        with self._lock:
+            self._expired(key)
+            value = super().__getitem__(key)
+            self._touch(key)
+            return value
+
+    def __delitem__(self, key):
+        with self._lock:
+            super().__delitem__(key)
+            self._expires.pop(key, None)
+
+    def get(self, key, default=None):
+        # OrderedDict.get bypasses __getitem__, so route it through the TTL check explicitly
+        with self._lock:
+            if key in self:
+                return self[key]
+            return default
+
+    def pop(self, key, *default):
+        # OrderedDict.pop bypasses __delitem__ too
+        with self._lock:
+            self._expires.pop(key, None)
+            return super().pop(key, *default)
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._expires.clear()
+
+    def _touch(self, key):
+        self.move_to_end(key)
+        if self.ttl is not None:
+            self._expires[key] = time.monotonic() + self.ttl
+
+    def _expired(self, key) -> bool:
+        expires = self._expires.get(key)
+        if expires is None or expires >= time.monotonic():
+            return False
+        self._evict(key, super().pop(key))
+        return True
+
+    def _evict(self, key, value):
+        self.evictions += 1
+        self._expires.pop(key, None)
+        if self.on_evict:
+            try:
+                self.on_evict(key, value)
+            except Exception as e:
+                print(f"Cache eviction hook failed for {key}: {e}")
+
+    def evict_expired(self) -> int:
+        """Drop entries past their TTL; the sliding TTL keeps expiry in LRU order, so only the head is checked"""
+        if self.ttl is None:
+            return 0
+        now = time.monotonic()
+        dropped = 0
+        with self._lock:
+            while len(self):
+                key = next(iter(self))
+                expires = self._expires.get(key)
+                if expires is not None and expires >= now:
+                    break
+                self._evict(key, super().pop(key))
+                dropped += 1
+        return dropped
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def _close_agent(conversation_id: str, agent_data: Dict[str, Any]):
+    _defer_eviction(_close_agent_now, agent_data)
+
+
+def _close_agent_now(agent_data: Dict[str, Any]):
+    agent_session = agent_data.get('agent_session')
+    if agent_session is not None:
+        agent_session.save()
+    sqlite_session = agent_data.get('sqlite_session')
+    if sqlite_session is not None and hasattr(sqlite_session, 'close'):
+        sqlite_session.close()
+
+
+# Answer unpacking per result type: the first result of a type is probed, later ones skip the hasattr chain
+_FINAL_OUTPUT_EXTRACTORS: Dict[type, Callable[[Any], str]] = {
+    str: lambda text: text,
+    type(None): lambda _: "",
+}
+
+
+def _final_output_extractor(final_output) -> Callable[[Any], str]:
+    if isinstance(final_output, str):
+        return lambda text: text
+    if hasattr(final_output, 'text_content'):
+        return operator.attrgetter('text_content')
+    return str
+
+
+_RESULT_EXTRACTORS: Dict[type, Callable[[Any], str]] = {}
+
+
+def _result_extractor(result) -> Callable[[Any], str]:
+    if hasattr(result, 'final_output'):
+        return lambda r: _extract_final_output(r.final_output)
+    return str
+
+
+def _extract_final_output(final_output) -> str:
+    extractor = _FINAL_OUTPUT_EXTRACTORS.get(type(final_output))
+    if extractor is None:
+        extractor = _FINAL_OUTPUT_EXTRACTORS.setdefault(type(final_output), _final_output_extractor(final_output))
+    return extractor(final_output)
+
+
+def _extract_result(result) -> str:
+    extractor = _RESULT_EXTRACTORS.get(type(result))
+    if extractor is None:
+        extractor = _RESULT_EXTRACTORS.setdefault(type(result), _result_extractor(result))
+    return extractor(result)
+
+
+def _read_file_text(path: str) -> str:
+    with open(path, 'rb') as f:
+        # Large transcripts decode straight from the mapped pages instead of an extra bytes copy
+        if os.fstat(f.fileno()).st_size > MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                # The decode walks the file once front to back, so let the kernel read ahead
+                if hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                return str(mapped, 'utf-8')
+        return f.read().decode('utf-8')
+
+
+@functools.lru_cache(maxsize=128)
+def _read_file_text_cached(path: str, mtime_ns: int, size: int) -> str:
+    # mtime_ns/size are only part of the key, so a rewritten file misses
+    return _read_file_text(path)
+
+
+def _save_session(conversation_id: str, agent_session: AgentSession):
+    _defer_eviction(agent_session.save)
+
+
+def _defer_eviction(func, *args):
+    # Hooks fire under the cache lock, mostly on the event loop; the file writes they need run here instead
+    try:
+        future = _evict_pool.submit(func, *args)
+    except RuntimeError:
+        # Pool already shut down: nothing else is serving requests, so write inline
+        func(*args)
+        return
+    future.add_done_callback(_report_eviction_error)
+
+
+def _report_eviction_error(future: concurrent.futures.Future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Cache eviction hook failed: {future.exception()}")
+
+
+TASKS_MAXSIZE = 10_000
+TASKS_TTL = 86400
+AGENTS_MAXSIZE = 500
+AGENTS_TTL = 3600
+SESSIONS_MAXSIZE = 1024
+PROCESSING_MAXSIZE = 10_000
+PROCESSING_TTL = 3600
+TRANSCRIPT_MAPS_MAXSIZE = 10_000
+JANITOR_INTERVAL = 60
+AUDIO_WORKERS = int(os.getenv("AUDIO_WORKERS", "4"))
+
+# Blocking upload steps (the suggestions LLM call, final DB/file writes) queue here, so a burst
+# of uploads can't take every thread from the default executor that request handlers rely on
+_audio_pool = concurrent.futures.ThreadPoolExecutor(max_workers=AUDIO_WORKERS, thread_name_prefix="audio")
+# One thread keeps evicted sessions' saves in eviction order
+_evict_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="evict")
+
+
+async def _run_audio_job(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(_audio_pool, functools.partial(func, *args))
+
+
+# Every update refreshes the sliding TTL, so only finished or abandoned uploads age out
+processing_status: Dict[str, Any] = BoundedCache(PROCESSING_MAXSIZE, ttl=PROCESSING_TTL)
 
 BASE_DIR = Path(__file__).resolve().parent
 DB_PATH = str(BASE_DIR / "conversations_metadata.db")
@@ -68,6 +314,8 @@ MEMORY_DB_PATH = str(BASE_DIR / "analyst_memory.db")
 CONV_DIR = BASE_DIR / "conversations"
 TRANSCRIPTS_DIR = BASE_DIR / "transcripts" / "processed"
 SUGGESTIONS_DIR = BASE_DIR / "suggestions"
+UPLOADS_DIR = BASE_DIR / "transcripts" / "uploads"
+MMAP_THRESHOLD = 1 << 20
 
 
 def update_processing_status(file_hash: str, stage: str, percent: int):
@@ -79,27 +327,108 @@ def update_processing_status(file_hash: str, stage: str, percent: int):
 
 
 def save_suggestions(file_hash: str, suggestions: list):
-    SUGGESTIONS_DIR.mkdir(parents=True, exist_ok=True)
+    ensure_dir(SUGGESTIONS_DIR)
     filepath = SUGGESTIONS_DIR / f"{file_hash}.json"
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(suggestions, f, ensure_ascii=False, indent=2)
+    # Temp file + atomic rename: readers never see a half-written file, and a crash leaves the old one intact
+    tmp_path = filepath.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    tmp_path.write_text(dumps_json(suggestions, indent=True), encoding="utf-8")
+    os.replace(tmp_path, filepath)
     print(f"✓ Saved suggestions to {filepath}")
 
 
+def has_suggestions(file_hash: str) -> bool:
+    return (SUGGESTIONS_DIR / f"{file_hash}.json").exists()
+
+
+def generate_suggestions_background(file_hash: str, transcript_text: str):
+    # A concurrent upload of the same file may have produced them meanwhile
+    if has_suggestions(file_hash):
+        return
+    suggestions = analyze_transcript_suggestions(transcript_text)
+    if suggestions:
+        save_suggestions(file_hash, suggestions)
+
+
 def load_suggestions(file_hash: str) -> list:
     filepath = SUGGESTIONS_DIR / f"{file_hash}.json"
     if filepath.exists():
-        with open(filepath, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return loads_json(filepath.read_bytes())
     return []
 
 
+def _report_recording_error(recording: asyncio.Task):
+    # Marks the exception retrieved when the run fails before _record_answer awaits it
+    if not recording.cancelled() and recording.exception() is not None:
+        print(f"Failed to record prompt: {recording.exception()}")
+
+
+class SlowClientError(Exception):
+    """The SSE consumer stopped draining its queue for longer than SSE_QUEUE_TIMEOUT"""
+
+
+class DeltaRing:
+    """Fixed-size event buffer between one agent run and its SSE consumer.
+
+    Both sides run on the event loop, so a push is a slot write plus Event.set() with no
+    suspension per token; the consumer wakes once and drains everything pushed meanwhile.
+    """
+    __slots__ = ('buf', 'head', 'tail', 'mask', 'event', 'drained', 'closed', 'abandoned')
+
+    def __init__(self, capacity: int = 1024):
+        size = 1 << max(capacity - 1, 0).bit_length()  # power of two, so slots are tail & mask
+        self.buf: List[Any] = [None] * size
+        self.head = 0
+        self.tail = 0
+        self.mask = size - 1
+        self.event = asyncio.Event()
+        # Only awaited by a producer that filled the ring, i.e. a client that stopped reading
+        self.drained = asyncio.Event()
+        self.closed = False
+        # The SSE client went away; the run finishes and records its answer, but nothing is buffered
+        self.abandoned = False
+
+    def __len__(self) -> int:
+        return self.tail - self.head
+
+    def full(self) -> bool:
+        return self.tail - self.head > self.mask
+
+    def push(self, item):
+        self.buf[self.tail & self.mask] = item
+        self.tail += 1
+        self.event.set()
+
+    def close(self):
+        self.closed = True
+        self.event.set()
+
+    def drop_pending(self):
+        for i in range(self.head, self.tail):
+            self.buf[i & self.mask] = None
+        self.head = self.tail
+        self.drained.set()
+
+    def abandon(self):
+        self.abandoned = True
+        self.drop_pending()
+
+
 class TranscriptService:
     def __init__(self):
-        self.tasks: Dict[str, TaskStatus] = {}
-        self.agents: Dict[str, Any] = {}
-        self.transcript_paths: Dict[str, str] = {}
-        self.streaming_tasks: Dict[str, asyncio.Queue] = {}
+        # Bounded so finished tasks and idle agents (with their transcripts) don't pile up forever
+        self.tasks: Dict[str, TaskStatus] = BoundedCache(TASKS_MAXSIZE, ttl=TASKS_TTL)
+        self.agents: Dict[str, Any] = BoundedCache(AGENTS_MAXSIZE, ttl=AGENTS_TTL, on_evict=_close_agent)
+        # Outlives agent eviction, so a rebuilt agent reuses the in-memory session and transcript
+        self.session_cache: Dict[str, AgentSession] = BoundedCache(SESSIONS_MAXSIZE, on_evict=_save_session)
+        self.transcript_paths: Dict[str, str] = BoundedCache(TRANSCRIPT_MAPS_MAXSIZE)
+        self.transcript_handles: Dict[str, str] = BoundedCache(TRANSCRIPT_MAPS_MAXSIZE)
+        self.streaming_tasks: Dict[str, DeltaRing] = {}
+        # Per-stream backpressure: a full ring stalls the producer, and one stalled too long is cut off
+        self.sse_max_queue = int(os.getenv("SSE_MAX_QUEUE_SIZE", "1000"))
+        self.sse_timeout = float(os.getenv("SSE_QUEUE_TIMEOUT", "5.0"))
+        self.sse_stats = {"slow_clients": 0, "max_queue_depth": 0}
+        # Tokens arriving within this window after a wakeup go out as one frame
+        self.sse_coalesce = float(os.getenv("SSE_COALESCE_MS", "20")) / 1000
 
         if HAS_REPOSITORY and ConversationRepository is not None:
             print(f"DEBUG: Using Database at {DB_PATH}")
@@ -107,23 +436,92 @@ class TranscriptService:
         else:
             self.repo = None
 
-    def load_transcript(self, transcript_path: str) -> str:
+    @staticmethod
+    def _read_transcript(transcript_path: str) -> str:
+        st = os.stat(transcript_path)
+        if st.st_size > MMAP_THRESHOLD:
+            return _read_file_text(transcript_path)
+        # Small transcripts are kept in memory until the file changes
+        return _read_file_text_cached(transcript_path, st.st_mtime_ns, st.st_size)
+
+    async def load_transcript(self, transcript_path: str) -> str:
         try:
-            with open(transcript_path, 'r', encoding='utf-8') as f:
-                return f.read()
+            return await asyncio.to_thread(self._read_transcript, transcript_path)
         except:
             return ""
 
+    def resolve_transcript(self, request: TaskRequest) -> Optional[str]:
+        """Validate a transcript handle, or issue one for a newly sent transcript_path"""
+        conversation_id = request.conversation.uuid
+        handle = self.transcript_handles.get(conversation_id)
+        if request.transcript_path:
+            # One handle per conversation, re-issued only when the path changes
+            if handle is None or self.transcript_paths.get(conversation_id) != request.transcript_path:
+                handle = uuid.uuid4().hex
+                self.transcript_handles[conversation_id] = handle
+                self.transcript_paths[conversation_id] = request.transcript_path
+            return handle
+        if request.transcript_handle:
+            if request.transcript_handle != handle:
+                raise HTTPException(status_code=409, detail="Unknown transcript handle")
+            return handle
+        return None
+
     async def create_task(self, request: TaskRequest) -> str:
-        task_id = str(uuid.uuid4())
+        task_id = uuid.uuid4().hex
         self.tasks[task_id] = TaskStatus(status="STARTED")
         if request.stream:
-            self.streaming_tasks[task_id] = asyncio.Queue()
+            self.streaming_tasks[task_id] = self._new_stream()
         asyncio.create_task(self._process_task(task_id, request))
         return task_id
 
+    async def create_tasks_batch(self, requests: List[TaskRequest]) -> List[str]:
+        task_ids = []
+        for request in requests:
+            task_id = uuid.uuid4().hex
+            self.tasks[task_id] = TaskStatus(status="STARTED")
+            if request.stream:
+                self.streaming_tasks[task_id] = self._new_stream()
+            task_ids.append(task_id)
+        # Run in submission order: batched questions usually share a conversation and its history
+        asyncio.create_task(self._process_batch(list(zip(task_ids, requests))))
+        return task_ids
+
+    async def janitor(self):
+        """Periodically expire idle entries, so TTLs apply even to keys nobody looks up again"""
+        while True:
+            await asyncio.sleep(JANITOR_INTERVAL)
+            for cache in (self.tasks, self.agents, processing_status):
+                cache.evict_expired()
+
+    def _new_stream(self) -> DeltaRing:
+        return DeltaRing(self.sse_max_queue)
+
+    async def _put_event(self, ring: DeltaRing, event):
+        # Only a full ring suspends the producer; the normal per-token path never awaits
+        if ring.abandoned:
+            return
+        if ring.full():
+            ring.drained.clear()
+            try:
+                await asyncio.wait_for(ring.drained.wait(), timeout=self.sse_timeout)
+            except asyncio.TimeoutError:
+                raise SlowClientError("slow client") from None
+        ring.push(event)
+
+    @staticmethod
+    def _abort_stream(ring: DeltaRing, error: str):
+        # Never blocks: unsent events are dropped so the error always fits
+        ring.drop_pending()
+        ring.push({"type": "error", "error": error})
+        ring.close()
+
+    async def _process_batch(self, batch):
+        for task_id, request in batch:
+            await self._process_task(task_id, request)
+
     async def _process_task(self, task_id: str, request: TaskRequest):
-        stream_queue = self.streaming_tasks.get(task_id)
+        ring = self.streaming_tasks.get(task_id)
         try:
             conversation_id = request.conversation.uuid
             message_id = request.message.uuid
@@ -133,8 +531,14 @@ class TranscriptService:
                 self.transcript_paths[conversation_id] = request.transcript_path
 
             if conversation_id not in self.agents:
-                agent_session = AgentSession(conversation_id, message_id)
-                agent_session.load()
+                agent_session = self.session_cache.get(conversation_id)
+                if agent_session is None:
+                    loaded = AgentSession(conversation_id, message_id)
+                    await asyncio.to_thread(loaded.load)
+                    # Another task may have cached this conversation while the file was read; keep the first copy
+                    agent_session = self.session_cache.get(conversation_id) or loaded
+                    self.session_cache[conversation_id] = agent_session
+                agent_session.message_id = message_id
 
                 if not agent_session.transcript:
                     transcript_path = self.transcript_paths.get(
@@ -142,8 +546,8 @@ class TranscriptService:
                         f"transcripts/processed/{conversation_id}.txt"
                     )
                     if os.path.exists(transcript_path):
-                        agent_session.transcript = self.load_transcript(transcript_path)
-                        agent_session.save()
+                        agent_session.transcript = await self.load_transcript(transcript_path)
+                        await asyncio.to_thread(agent_session.save)
 
                 transcript = agent_session.transcript or ""
                 agent, sqlite_session = await create_agent(conversation_id=conversation_id, transcript=transcript)
@@ -159,87 +563,114 @@ class TranscriptService:
                 agent_session = agent_data['agent_session']
                 agent_session.message_id = message_id
 
-            if request.stream and stream_queue:
-                await self._run_agent_streaming(agent, prompt, sqlite_session, agent_session, task_id, stream_queue)
+            if request.stream and ring is not None:
+                await self._run_agent_streaming(agent, prompt, sqlite_session, agent_session, task_id, message_id,
+                                                ring)
             else:
-                await self._run_agent_non_streaming(agent, prompt, sqlite_session, agent_session, task_id)
+                await self._run_agent_non_streaming(agent, prompt, sqlite_session, agent_session, task_id, message_id)
 
         except Exception as e:
             import traceback
             traceback.print_exc()
-            if stream_queue:
-                await stream_queue.put({"type": "error", "error": str(e)})
-                await stream_queue.put(None)
+            if ring is not None:
+                self._abort_stream(ring, str(e))
             self.tasks[task_id] = TaskStatus(status="FAILED", failure=str(e))
         finally:
             if task_id in self.streaming_tasks:
                 del self.streaming_tasks[task_id]
 
-    async def _run_agent_non_streaming(self, agent, prompt, sqlite_session, agent_session, task_id):
-        if self.repo:
-            # Проверяем, есть ли уже сообщения - если нет, это первое сообщение
-            existing_msgs = self.repo.list_messages(agent_session.conversation_id, limit=1)
-            if not existing_msgs:
-                # Первое сообщение - устанавливаем авто-имя
-                auto_title = prompt[:50] + ("..." if len(prompt) > 50 else "")
-                self.repo.create_or_update_conversation(agent_session.conversation_id, "default-user", title=auto_title)
-            self.repo.create_message(agent_session.message_id, agent_session.conversation_id, "default-user", task_id,
-                                     prompt)
+    async def _run_agent_non_streaming(self, agent, prompt, sqlite_session, agent_session, task_id, message_id):
+        recording = self._start_recording_prompt(agent_session.conversation_id, message_id, task_id, prompt)
 
+        # Stays on this loop: the SDK's shared httpx client is bound to the loop that first used it
         result = await Runner.run(agent, prompt, session=sqlite_session, context=agent_session)
         answer_text = self._extract_answer_text(result)
         agent_session.add_answer(answer_text)
-        agent_session.save()
+        await asyncio.to_thread(agent_session.save)
 
-        if self.repo:
-            self.repo.update_message(agent_session.message_id, answer=answer_text)
+        await self._record_answer(recording, message_id, answer_text)
         self.tasks[task_id] = TaskStatus(status="SUCCESS", result={'text': answer_text})
 
-    async def _run_agent_streaming(self, agent, prompt, sqlite_session, agent_session, task_id, stream_queue):
-        if self.repo:
-            # Проверяем, есть ли уже сообщения - если нет, это первое сообщение
-            existing_msgs = self.repo.list_messages(agent_session.conversation_id, limit=1)
-            if not existing_msgs:
-                # Первое сообщение - устанавливаем авто-имя
+    def _start_recording_prompt(self, conversation_id, message_id, task_id, prompt) -> Optional[asyncio.Task]:
+        # The prompt's DB writes overlap the agent run instead of delaying its start.
+        # Ids are passed in, not read off the shared AgentSession: the next request on it overwrites message_id
+        if not self.repo:
+            return None
+        recording = asyncio.create_task(
+            asyncio.to_thread(self._record_prompt, conversation_id, message_id, task_id, prompt))
+        recording.add_done_callback(_report_recording_error)
+        return recording
+
+    async def _record_answer(self, recording: Optional[asyncio.Task], message_id, answer_text: str):
+        if recording is None:
+            return
+        # The message row must exist before its answer is written; without it the answer stays in the session only
+        try:
+            await recording
+        except Exception:
+            # Already reported by _report_recording_error; the run itself finished and must not be marked FAILED
+            return
+        await asyncio.to_thread(self.repo.update_message, message_id, answer=answer_text)
+
+    def _record_prompt(self, conversation_id, message_id, task_id, prompt):
+        # Title and message go in one commit; the answer is written after the run so no transaction spans it
+        with self.repo.transaction():
+            # A titled conversation needs no UPSERT: create_message's counter bump already refreshes updated_at
+            conversation = self.repo.get_conversation(conversation_id)
+            if conversation is None or not conversation.title:
+                # Авто-имя из первого сообщения: UPSERT ставит его, только если title ещё пуст
                 auto_title = prompt[:50] + ("..." if len(prompt) > 50 else "")
-                self.repo.create_or_update_conversation(agent_session.conversation_id, "default-user", title=auto_title)
-            self.repo.create_message(agent_session.message_id, agent_session.conversation_id, "default-user", task_id,
-                                     prompt)
+                self.repo.create_or_update_conversation(conversation_id, "default-user",
+                                                        auto_title=auto_title)
+            self.repo.create_message(message_id, conversation_id, "default-user", task_id, prompt)
+
+    async def _run_agent_streaming(self, agent, prompt, sqlite_session, agent_session, task_id, message_id, ring):
+        recording = self._start_recording_prompt(agent_session.conversation_id, message_id, task_id, prompt)
 
         streamed = Runner.run_streamed(agent, prompt, session=sqlite_session, context=agent_session)
-        full_text = ""
+        chunks: List[str] = []
+        # Hoisted for the per-token loop
+        append_chunk = chunks.append
+        push = ring.push
+        full = ring.full
 
-        async for event in streamed.stream_events():
-            if event.type == "raw_response_event" and hasattr(event, 'data') and hasattr(event.data, 'delta'):
-                delta = event.data.delta
-                full_text += delta
-                await stream_queue.put({"type": "delta", "delta": delta, "accumulated": full_text})
+        try:
+            async for event in streamed.stream_events():
+                if event.type != "raw_response_event":
+                    continue
+                # One defaulted lookup per event instead of two hasattr probes plus the fetch
+                delta = getattr(getattr(event, 'data', None), 'delta', None)
+                if delta is not None:
+                    append_chunk(delta)
+                    # Bare strings are deltas; the SSE generator frames and coalesces them.
+                    # Clients concatenate deltas themselves; the full text only goes out once, with "done"
+                    if ring.abandoned or full():
+                        await self._put_event(ring, delta)
+                    else:
+                        push(delta)
+        except SlowClientError:
+            streamed.cancel()
+            self.sse_stats["slow_clients"] += 1
+            raise
+
+        full_text = "".join(chunks)
 
         final_output = streamed.final_output
         answer_text = self._extract_answer_text_from_final(final_output) or full_text
         agent_session.add_answer(answer_text)
-        agent_session.save()
+        await asyncio.to_thread(agent_session.save)
 
-        if self.repo:
-            self.repo.update_message(agent_session.message_id, answer=answer_text)
+        await self._record_answer(recording, message_id, answer_text)
 
-        await stream_queue.put({"type": "done", "text": answer_text})
-        await stream_queue.put(None)
+        await self._put_event(ring, {"type": "done", "text": answer_text})
+        ring.close()
         self.tasks[task_id] = TaskStatus(status="SUCCESS", result={'text': answer_text})
 
     def _extract_answer_text(self, result) -> str:
-        if hasattr(result, 'final_output'):
-            return self._extract_answer_text_from_final(result.final_output)
-        return str(result)
+        return _extract_result(result)
 
     def _extract_answer_text_from_final(self, final_output) -> str:
-        if final_output is None:
-            return ""
-        if isinstance(final_output, str):
-            return final_output
-        if hasattr(final_output, 'text_content'):
-            return final_output.text_content
-        return str(final_output)
+        return _extract_final_output(final_output)
 
     def get_task_status(self, task_id: str) -> TaskStatus:
         if task_id not in self.tasks:
@@ -247,44 +678,93 @@ class TranscriptService:
         return self.tasks[task_id]
 
     def reset(self):
-        self.tasks = {}
-        self.agents = {}
-        self.transcript_paths = {}
+        self.tasks = BoundedCache(TASKS_MAXSIZE, ttl=TASKS_TTL)
+        self.agents = BoundedCache(AGENTS_MAXSIZE, ttl=AGENTS_TTL, on_evict=_close_agent)
+        self.session_cache = BoundedCache(SESSIONS_MAXSIZE, on_evict=_save_session)
+        self.transcript_paths = BoundedCache(TRANSCRIPT_MAPS_MAXSIZE)
+        self.transcript_handles = BoundedCache(TRANSCRIPT_MAPS_MAXSIZE)
         self.streaming_tasks = {}
         self.repo = None
 
 
-def process_audio_background(file_bytes, transcript_path, file_hash, conversation_uuid, user_uuid, filename):
-    try:
-        def report_status(stage, pct):
-            update_processing_status(file_hash, stage, pct)
+def attach_cached_transcript(transcript_path, file_hash, conversation_uuid, user_uuid, filename) -> str:
+    """Bind a new conversation to an already processed transcript; returns the transcript text"""
+    session = AgentSession(conversation_uuid, "")
+    session.transcript = service._read_transcript(transcript_path)
+    session.save()
 
-        process_audio_with_deepgram(file_bytes, transcript_path, status_callback=report_status)
+    if service.repo:
+        # Сохраняем file_hash в базу!
+        service.repo.create_or_update_conversation(
+            conversation_uuid=conversation_uuid,
+            user_uuid=user_uuid,
+            title=f"{filename} (Cached)",
+            file_hash=file_hash
+        )
+        service.transcript_paths[conversation_uuid] = transcript_path
 
-        with open(transcript_path, 'r', encoding='utf-8') as f:
-            transcript_text = f.read()
+    return session.transcript
 
-        report_status("Generating suggestions...", 85)
-        suggestions = analyze_transcript_suggestions(transcript_text, status_callback=report_status)
 
-        if suggestions:
-            save_suggestions(file_hash, suggestions)
+def _save_upload(source, dest: Path) -> str:
+    """Copy the upload to dest and return its hash, reading it once"""
+    ensure_dir(dest.parent)
+    with open(dest, "wb") as f:
+        return calculate_file_hash_stream(source, MMAP_THRESHOLD, copy_to=f)
+
+
+def _finish_processing(transcript_text, transcript_path, file_hash, conversation_uuid, user_uuid, filename,
+                       suggestions):
+    if suggestions:
+        save_suggestions(file_hash, suggestions)
+
+    update_processing_status(file_hash, "Finalizing...", 98)
+
+    session = AgentSession(conversation_uuid, "")
+    session.transcript = transcript_text
+    session.save()
+
+    if service.repo:
+        # Сохраняем file_hash в базу!
+        service.repo.create_or_update_conversation(
+            conversation_uuid=conversation_uuid,
+            user_uuid=user_uuid,
+            title=filename,
+            file_hash=file_hash
+        )
+        service.transcript_paths[conversation_uuid] = transcript_path
+
+
+# file_hash -> conversations (conversation_uuid, user_uuid, filename) that uploaded the same audio while it was
+# still being transcribed; the running job attaches them instead of sending the audio to Deepgram again
+_inflight_uploads: Dict[str, List[tuple]] = {}
+
+
+async def process_audio_background(audio_path, transcript_path, file_hash, conversation_uuid, user_uuid, filename):
+    # Runs on the server loop so the Deepgram upload goes through the shared DEEPGRAM_CLIENT pool
+    try:
+        def report_status(stage, pct):
+            update_processing_status(file_hash, stage, pct)
+
+        transcript_text = await process_audio_with_deepgram_async(
+            audio_path, transcript_path, status_callback=report_status, file_hash=file_hash, client=DEEPGRAM_CLIENT
+        )
 
-        report_status("Finalizing...", 98)
+        suggestions = []
+        # Re-uploads of a known file already have suggestions on disk
+        if not has_suggestions(file_hash):
+            report_status("Generating suggestions...", 85)
+            suggestions = await _run_audio_job(analyze_transcript_suggestions, transcript_text, report_status)
 
-        session = AgentSession(conversation_uuid, "")
-        session.transcript = transcript_text
-        session.save()
+        await _run_audio_job(_finish_processing, transcript_text, transcript_path, file_hash,
+                            conversation_uuid, user_uuid, filename, suggestions)
+        # The transcript file is written in the background; it must be on disk before we report Ready
+        await flush_pending_writes()
 
-        if service.repo:
-            # Сохраняем file_hash в базу!
-            service.repo.create_or_update_conversation(
-                conversation_uuid=conversation_uuid,
-                user_uuid=user_uuid,
-                title=filename,
-                file_hash=file_hash
-            )
-            service.transcript_paths[conversation_uuid] = transcript_path
+        # Duplicates share this file_hash's status, so they have to be attached before it reads Ready
+        waiting = _inflight_uploads.get(file_hash, [])
+        while waiting:
+            await _run_audio_job(attach_cached_transcript, transcript_path, file_hash, *waiting.pop(0))
 
         processing_status[file_hash] = {"status": "completed", "percent": 100, "stage": "Ready"}
         print(f"✓ Processing complete: {conversation_uuid} (hash: {file_hash})")
@@ -295,8 +775,65 @@ def process_audio_background(file_bytes, transcript_path, file_hash, conversatio
         print(f"Background processing error: {e}")
         processing_status[file_hash] = {"status": "error", "error": str(e)}
 
+    finally:
+        _inflight_uploads.pop(file_hash, None)
+        Path(audio_path).unlink(missing_ok=True)
+
+
+# Fire-and-forget server tasks, referenced here so they aren't garbage collected mid-run
+_background_jobs: set = set()
+
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+_END_FRAME = b'data: {"type":"end"}\n\n'
+_ERROR_FRAME_PREFIX = b'data: {"type":"error","error":'
+_ERROR_FRAME_SUFFIX = b'}\n\n'
+
+
+def _sse_frame(event) -> bytes:
+    # Whole frame as bytes, so StreamingResponse sends it without another encode
+    if orjson is not None:
+        return _SSE_PREFIX + orjson.dumps(event) + _SSE_SUFFIX
+    return _SSE_PREFIX + dumps_json(event).encode("utf-8") + _SSE_SUFFIX
+
+
+def _error_frame(message: str) -> bytes:
+    # Only the message is encoded; as a JSON string literal, so quotes, backslashes and newlines are escaped properly
+    encoded = orjson.dumps(message) if orjson is not None else dumps_json(message).encode("utf-8")
+    return _ERROR_FRAME_PREFIX + encoded + _ERROR_FRAME_SUFFIX
+
+
+def _rows_response(payload: Dict[str, Any]):
+    # orjson encodes the dataclass rows natively in one pass; returning a Response skips FastAPI's jsonable_encoder copy
+    if orjson is not None:
+        return ORJSONResponse(payload)
+    # Конвертируем dataclass в dict для JSON
+    return {key: [asdict(row) for row in value] if isinstance(value, list) else value
+            for key, value in payload.items()}
+
+
+# ORJSONResponse needs orjson at serialization time, so only use it when it imported
+app = FastAPI(
+    title="Transcript Agent Service",
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse,
+)
+
+
+@app.on_event("startup")
+async def start_janitor():
+    _background_jobs.add(asyncio.create_task(service.janitor()))
+
+
+@app.on_event("shutdown")
+async def close_shared_clients():
+    for job in _background_jobs:
+        job.cancel()
+    await flush_pending_writes()
+    await DEEPGRAM_CLIENT.aclose()
+    _audio_pool.shutdown(wait=False, cancel_futures=True)
+    # Evicted sessions still being saved must reach disk
+    await asyncio.to_thread(_evict_pool.shutdown, wait=True)
 
-app = FastAPI(title="Transcript Agent Service")
 
 app.add_middleware(
     CORSMiddleware,
@@ -314,10 +851,26 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics/caches")
+async def cache_metrics():
+    return {"tasks": service.tasks.stats(), "agents": service.agents.stats(),
+            "sessions": service.session_cache.stats(), "processing": processing_status.stats(),
+            "streams": service.sse_stats}
+
+
 @app.post("/transcript/task", response_model=TaskResponse)
 async def create_task(request: TaskRequest):
+    transcript_handle = service.resolve_transcript(request)
     task_id = await service.create_task(request)
-    return TaskResponse(task_id=task_id)
+    return TaskResponse(task_id=task_id, transcript_handle=transcript_handle)
+
+
+@app.post("/transcript/tasks", response_model=TaskBatchResponse)
+async def create_tasks_batch(request: TaskBatchRequest):
+    # Every handle is checked before any task starts, so a 409 leaves nothing half-submitted
+    transcript_handles = [service.resolve_transcript(task) for task in request.tasks]
+    task_ids = await service.create_tasks_batch(request.tasks)
+    return TaskBatchResponse(task_ids=task_ids, transcript_handles=transcript_handles)
 
 
 @app.get("/transcript/task/{task_id}", response_model=TaskStatus)
@@ -327,20 +880,60 @@ async def get_task_status_endpoint(task_id: str):
 
 @app.get("/transcript/task/{task_id}/stream")
 async def stream_task_response(task_id: str):
+    """SSE events: {"type": "delta", "delta": str}, then {"type": "done", "text": full answer} and "end".
+    A delta holds every token produced within SSE_COALESCE_MS and carries no running total;
+    clients concatenate them."""
     if task_id not in service.streaming_tasks:
         raise HTTPException(status_code=404, detail="Streaming not available")
 
     async def event_generator():
-        queue = service.streaming_tasks[task_id]
+        ring = service.streaming_tasks[task_id]
+        buf, mask = ring.buf, ring.mask
+        coalesce = service.sse_coalesce
         try:
             while True:
-                event = await queue.get()
-                if event is None:
-                    yield f"data: {json.dumps({'type': 'end'})}\n\n"
+                depth = len(ring)
+                if depth > service.sse_stats["max_queue_depth"]:
+                    service.sse_stats["max_queue_depth"] = depth
+                if coalesce and depth and not ring.closed:
+                    await asyncio.sleep(coalesce)
+                # Everything pushed since the last wakeup goes out as one write, consecutive deltas as one frame
+                frames: List[bytes] = []
+                deltas: List[str] = []
+                while ring.head < ring.tail:
+                    slot = ring.head & mask
+                    event = buf[slot]
+                    buf[slot] = None
+                    ring.head += 1
+                    if isinstance(event, str):
+                        deltas.append(event)
+                        continue
+                    if deltas:
+                        frames.append(_sse_frame({"type": "delta", "delta": "".join(deltas)}))
+                        deltas.clear()
+                    frames.append(_sse_frame(event))
+                if deltas:
+                    frames.append(_sse_frame({"type": "delta", "delta": "".join(deltas)}))
+                ring.drained.set()
+                # Read once: the producer may close the ring while the write below is in flight
+                closed = ring.closed
+                if closed:
+                    frames.append(_END_FRAME)
+                if frames:
+                    yield b"".join(frames)
+                if closed:
                     break
-                yield f"data: {json.dumps(event)}\n\n"
+                # Anything pushed (or a close) during the write is picked up without sleeping
+                if ring.head == ring.tail and not ring.closed:
+                    ring.event.clear()
+                    await ring.event.wait()
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+            yield _error_frame(str(e))
+        finally:
+            # Disconnects land here too (cancellation or aclose); free the backlog right away
+            if not ring.closed:
+                ring.abandon()
+            service.streaming_tasks.pop(task_id, None)
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
@@ -350,8 +943,7 @@ async def list_conversations(user_uuid: str, limit: int = 100):
     if not service.repo:
         return {"conversations": []}
     convs = service.repo.list_conversations(user_uuid, limit)
-    # Конвертируем dataclass в dict для JSON
-    return {"conversations": [asdict(c) for c in convs]}
+    return _rows_response({"conversations": convs})
 
 
 @app.get("/conversations/{conversation_uuid}/messages")
@@ -359,7 +951,7 @@ async def get_conversation_messages(conversation_uuid: str, limit: int = 100):
     if not service.repo:
         return {"messages": []}
     msgs = service.repo.list_messages(conversation_uuid, limit)
-    return {"conversation_uuid": conversation_uuid, "messages": [asdict(m) for m in msgs]}
+    return _rows_response({"conversation_uuid": conversation_uuid, "messages": msgs})
 
 
 @app.get("/suggestions/{file_hash}")
@@ -371,18 +963,18 @@ async def get_suggestions(file_hash: str):
 async def rename_conversation(conversation_uuid: str, title: str):
     """Переименовать conversation"""
     if service.repo:
-        conn = service.repo._get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            'UPDATE conversations SET title = ?, updated_at = ? WHERE uuid = ?',
-            (title, datetime.now().isoformat(), conversation_uuid)
-        )
-        conn.commit()
+        service.repo.rename_conversation(conversation_uuid, title)
         return {"status": "renamed", "title": title}
     raise HTTPException(status_code=400, detail="Repository not available")
 
 
 # clear ДОЛЖЕН быть ДО {conversation_uuid}
+def _remove_trees(paths: List[Path]):
+    for path in paths:
+        shutil.rmtree(path, ignore_errors=True)
+        print(f"✓ Deleted folder: {path}")
+
+
 @app.delete("/conversations/clear")
 async def clear_history(user_uuid: str):
     global service, processing_status
@@ -398,31 +990,49 @@ async def clear_history(user_uuid: str):
         except Exception as e:
             print(f"✗ Database reset error: {e}")
 
+    # hard_reset already rebuilt the schema, so the same repository (and its connections) carries on
+    repo = service.repo
     service.reset()
     processing_status.clear()
 
-    for db_file in glob.glob(f"{MEMORY_DB_PATH}*"):
-        if os.path.exists(db_file):
+    # One listing of BASE_DIR finds the agent memory db (with its -wal/-shm) and trash from an earlier clear
+    memory_db = os.path.basename(MEMORY_DB_PATH)
+    with os.scandir(BASE_DIR) as it:
+        entries = list(it)
+    for entry in entries:
+        if entry.name.startswith(memory_db) and entry.is_file():
             try:
-                os.remove(db_file)
-                print(f"✓ Deleted: {db_file}")
+                os.unlink(entry.path)
+                print(f"✓ Deleted: {entry.path}")
             except Exception as e:
                 print(f"✗ Error: {e}")
+    # Also sweeps trash left behind by an earlier clear that didn't finish
+    trash = [Path(entry.path) for entry in entries if ".trash-" in entry.name]
 
-    folders = [CONV_DIR, TRANSCRIPTS_DIR, SUGGESTIONS_DIR, BASE_DIR / "transcripts"]
-    for folder in folders:
+    # Rename now (O(1) each), delete the contents in a worker thread; transcripts/ also holds processed/ and .cache/
+    suffix = f".trash-{time.time_ns()}"
+    for folder in [CONV_DIR, SUGGESTIONS_DIR, BASE_DIR / "transcripts"]:
         if folder.exists():
             try:
-                shutil.rmtree(folder)
-                print(f"✓ Deleted folder: {folder}")
+                moved = folder.rename(folder.with_name(folder.name + suffix))
+                trash.append(moved)
+                print(f"✓ Moved folder aside: {folder}")
             except Exception as e:
                 print(f"✗ Error: {e}")
+    cleanup = asyncio.create_task(asyncio.to_thread(_remove_trees, trash))
+    _background_jobs.add(cleanup)
+    cleanup.add_done_callback(_background_jobs.discard)
 
+    forget_ensured_dirs()
+    _read_file_text_cached.cache_clear()
     for folder in [CONV_DIR, TRANSCRIPTS_DIR, SUGGESTIONS_DIR]:
-        folder.mkdir(parents=True, exist_ok=True)
+        ensure_dir(folder)
     print("✓ Recreated empty folders")
 
-    if HAS_REPOSITORY and ConversationRepository is not None:
+    if repo is not None:
+        service.repo = repo
+        print("✓ Repository kept")
+    elif HAS_REPOSITORY and ConversationRepository is not None:
         service.repo = ConversationRepository(db_path=DB_PATH)
         print("✓ Repository reconnected")
 
@@ -439,6 +1049,7 @@ async def delete_conversation(conversation_uuid: str):
         service.repo.delete_conversation(conversation_uuid)
     if conversation_uuid in service.agents:
         del service.agents[conversation_uuid]
+    service.session_cache.pop(conversation_uuid, None)
 
     session_file = CONV_DIR / conversation_uuid
     if session_file.exists():
@@ -461,20 +1072,30 @@ async def upload_audio_and_start(
         file: UploadFile = File(...),
         user_uuid: str = Form(...)
 ):
-    file_bytes = await file.read()
-    file_hash = calculate_file_hash(file_bytes)
+    conversation_uuid = str(uuid.uuid4())
 
-    TRANSCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
+    # One chunked pass off the event loop hashes the upload and copies it to disk.
+    # The upload is closed once the response is sent, so the background task needs its own copy.
+    audio_path = UPLOADS_DIR / f"{conversation_uuid}.upload"
+    file_hash = await asyncio.to_thread(_save_upload, file.file, audio_path)
+
+    ensure_dir(TRANSCRIPTS_DIR)
     transcript_path = str(TRANSCRIPTS_DIR / f"{file_hash}.txt")
 
-    conversation_uuid = str(uuid.uuid4())
     is_cached = os.path.exists(transcript_path)
-
-    if not is_cached:
+    suggestions_pending = False
+
+    if file_hash in _inflight_uploads:
+        # Same audio is already being transcribed; ride along on that job and its processing status
+        audio_path.unlink(missing_ok=True)
+        _inflight_uploads[file_hash].append((conversation_uuid, user_uuid, file.filename))
+        is_cached = False
+    elif not is_cached:
+        _inflight_uploads[file_hash] = []
         processing_status[file_hash] = {"status": "uploading", "stage": "Queued", "percent": 0}
         background_tasks.add_task(
             process_audio_background,
-            file_bytes,
+            str(audio_path),
             transcript_path,
             file_hash,
             conversation_uuid,
@@ -482,32 +1103,22 @@ async def upload_audio_and_start(
             file.filename
         )
     else:
-        session = AgentSession(conversation_uuid, "")
-        with open(transcript_path, 'r', encoding='utf-8') as f:
-            session.transcript = f.read()
-        session.save()
-
-        existing_suggestions = load_suggestions(file_hash)
-        if not existing_suggestions:
-            suggestions = analyze_transcript_suggestions(session.transcript)
-            if suggestions:
-                save_suggestions(file_hash, suggestions)
-
-        if service.repo:
-            # Сохраняем file_hash в базу!
-            service.repo.create_or_update_conversation(
-                conversation_uuid=conversation_uuid,
-                user_uuid=user_uuid,
-                title=f"{file.filename} (Cached)",
-                file_hash=file_hash
-            )
-            service.transcript_paths[conversation_uuid] = transcript_path
+        audio_path.unlink(missing_ok=True)
+        # Disk reads and the session/DB writes block, so off the loop
+        transcript_text = await asyncio.to_thread(
+            attach_cached_transcript, transcript_path, file_hash, conversation_uuid, user_uuid, file.filename
+        )
+        # The suggestions LLM call must not hold up the response; the frontend fetches them later
+        if not has_suggestions(file_hash):
+            suggestions_pending = True
+            background_tasks.add_task(_run_audio_job, generate_suggestions_background, file_hash, transcript_text)
 
     return {
         "status": "success",
         "conversation_uuid": conversation_uuid,
         "file_hash": file_hash,
         "is_cached": is_cached,
+        "suggestions_pending": suggestions_pending,
         "filename": file.filename
     }
 
@@ -516,4 +1127,9 @@ if __name__ == "__main__":
     TRANSCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
     CONV_DIR.mkdir(exist_ok=True)
     SUGGESTIONS_DIR.mkdir(exist_ok=True)
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # uvloop/httptools when installed (Linux/macOS); named explicitly so a missing one is visible at startup
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    print(f"Event loop: {loop}, HTTP parser: {http}")
+    # Single worker: tasks, agents and stream queues live in this process's memory
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop=loop, http=http)
\ No newline at end of file